@@ -1,17 +1,18 @@
 from django.contrib import admin
-from .models import Member, GymSession
+from .models import Member, GymSession, DailyMemberStats, HourlyOccupancy, MemberStats
 
 @admin.register(Member)
 class MemberAdmin(admin.ModelAdmin):
     list_display = ['name', 'phone_number', 'subscription_start', 'subscription_end', 'has_active_subscription']
     search_fields = ['name', 'phone_number']
-    list_filter = ['is_in_gym', 'subscription_start'] 
-    readonly_fields = ['has_active_subscription']
+    list_filter = ['is_in_gym', 'subscription_active', 'subscription_start']
+    readonly_fields = ['has_active_subscription', 'subscription_active']
     
     def has_active_subscription(self, obj):
         return obj.has_active_subscription
     has_active_subscription.boolean = True
     has_active_subscription.short_description = "Active Subscription"
+    has_active_subscription.admin_order_field = "subscription_active"
     
 @admin.register(GymSession)
 class GymSessionAdmin(admin.ModelAdmin):
@@ -19,3 +20,22 @@ class GymSessionAdmin(admin.ModelAdmin):
     list_filter = ['entry_time', 'exit_time']
     search_fields = ['member__name', 'member__phone_number']
     readonly_fields = ['member']
+
+@admin.register(DailyMemberStats)
+class DailyMemberStatsAdmin(admin.ModelAdmin):
+    list_display = ['member', 'date', 'visits', 'total_duration']
+    list_filter = ['date']
+    search_fields = ['member__name', 'member__phone_number']
+    readonly_fields = ['member', 'date', 'visits', 'total_duration']
+
+@admin.register(HourlyOccupancy)
+class HourlyOccupancyAdmin(admin.ModelAdmin):
+    list_display = ['hour', 'visits', 'total_duration', 'occupied_minutes']
+    list_filter = ['hour']
+    readonly_fields = ['hour', 'visits', 'total_duration', 'occupied_minutes']
+
+@admin.register(MemberStats)
+class MemberStatsAdmin(admin.ModelAdmin):
+    list_display = ['member', 'total_visits', 'total_duration', 'last_visit_date', 'longest_streak']
+    search_fields = ['member__name', 'member__phone_number']
+    readonly_fields = [field.name for field in MemberStats._meta.fields]
@@ -0,0 +1,131 @@
+"""
+Occupancy time series computed with a sweep-line over session start and end
+events.
+
+Every session overlapping the requested range is read once, clipped to the
+range and turned into a start and an end event. Sorting the events answers
+every bucket, the peak and the mean in one pass, instead of one COUNT query
+per bucket. NumPy is used when it is installed and pure Python otherwise.
+"""
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import accumulate
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+from .models import Member, GymSession, SESSION_TIME_LIMIT
+
+# Longest recorded session in minutes, refreshed by rebuild_rollups
+LONGEST_SESSION_CACHE_KEY = "gym:longest_session"
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def session_intervals(start, end, now=None):
+    """
+    Return (entry, exit) POSIX timestamp pairs of every visit overlapping
+    [start, end), clipped to that range. Open sessions last until now, and
+    overdue ones end at SESSION_TIME_LIMIT like their auto-closed records.
+    """
+    now = now or timezone.now()
+    recorded = GymSession.objects.filter(
+        entry_time__gte=start - session_lookback(), entry_time__lt=end, exit_time__gt=start
+    ).values_list("entry_time", "exit_time")
+    open_entries = Member.objects.filter(
+        is_in_gym=True, entry_time__isnull=False, entry_time__lt=end
+    ).values_list("entry_time", flat=True)
+
+    visits = list(recorded.iterator(chunk_size=5000))
+    visits += [(entry, min(now, entry + SESSION_TIME_LIMIT)) for entry in open_entries]
+
+    start_ts, end_ts = start.timestamp(), end.timestamp()
+    intervals = []
+    for entry, exit in visits:
+        entry_ts, exit_ts = max(entry.timestamp(), start_ts), min(exit.timestamp(), end_ts)
+        if exit_ts > entry_ts:
+            intervals.append((entry_ts, exit_ts))
+    return intervals
+
+
+def session_lookback():
+    """
+    How long before a range a session overlapping it can have started, which
+    bounds the index range scan. New sessions never exceed SESSION_TIME_LIMIT,
+    but ones recorded before the limit existed can, so the longest recorded
+    duration is read once and cached. New sessions never raise it.
+    """
+    longest = cache.get(LONGEST_SESSION_CACHE_KEY)
+    if longest is None:
+        longest = GymSession.objects.aggregate(longest=Max("duration"))["longest"] or 0
+        cache.set(LONGEST_SESSION_CACHE_KEY, longest, timeout=None)
+    return max(SESSION_TIME_LIMIT, timedelta(minutes=longest))
+
+
+def _sweep_numpy(intervals, samples):
+    """Vectorized sweep: counts at each sample, peak count and its time, member-seconds"""
+    entries = np.sort(np.fromiter((entry for entry, _ in intervals), dtype=float, count=len(intervals)))
+    exits = np.sort(np.fromiter((exit for _, exit in intervals), dtype=float, count=len(intervals)))
+    samples = np.asarray(samples, dtype=float)
+    counts = np.searchsorted(entries, samples, side="right") - np.searchsorted(exits, samples, side="right")
+
+    if not intervals:
+        return counts.tolist(), 0, None, 0.0
+    times = np.concatenate((entries, exits))
+    deltas = np.concatenate((np.ones(len(entries)), -np.ones(len(exits))))
+    # Exits sort before entries at the same instant, so back-to-back visits do not overlap
+    order = np.lexsort((deltas, times))
+    running = np.cumsum(deltas[order])
+    peak_index = int(np.argmax(running))
+    return (
+        counts.tolist(),
+        int(running[peak_index]),
+        float(times[order][peak_index]),
+        float((exits - entries).sum()),
+    )
+
+
+def _sweep_python(intervals, samples):
+    """Pure Python fallback of _sweep_numpy"""
+    entries = sorted(entry for entry, _ in intervals)
+    exits = sorted(exit for _, exit in intervals)
+    counts = [bisect_right(entries, sample) - bisect_right(exits, sample) for sample in samples]
+
+    if not intervals:
+        return counts, 0, None, 0.0
+    events = sorted([(entry, 1) for entry in entries] + [(exit, -1) for exit in exits])
+    running = list(accumulate(delta for _, delta in events))
+    peak_index = max(range(len(running)), key=running.__getitem__)
+    return counts, running[peak_index], events[peak_index][0], sum(exits) - sum(entries)
+
+
+def occupancy_curve(start, end, interval=timedelta(minutes=15), now=None):
+    """
+    Compute how many members were in the gym at the start of every interval
+    between start and end, the peak occupancy with the moment it was first
+    reached, and the time-weighted mean occupancy over the whole range.
+    """
+    intervals = session_intervals(start, end, now=now)
+    step = interval.total_seconds()
+    sample_count = int((end - start).total_seconds() // step)
+    samples = [start.timestamp() + step * index for index in range(sample_count)]
+
+    sweep = _sweep_numpy if np is not None else _sweep_python
+    counts, peak_count, peak_ts, occupied_seconds = sweep(intervals, samples)
+
+    def to_local(timestamp):
+        return timezone.localtime(datetime.fromtimestamp(timestamp, tz=dt_timezone.utc))
+
+    return {
+        "peak": {
+            "count": peak_count,
+            "time": to_local(peak_ts) if peak_ts is not None else None,
+        },
+        "mean": occupied_seconds / (end - start).total_seconds(),
+        "results": [
+            {"time": to_local(sample), "count": count}
+            for sample, count in zip(samples, counts)
+        ],
+    }
@@ -0,0 +1,225 @@
+"""
+Async-native versions of the hot endpoints, for deployments served under ASGI.
+
+They read through Django's async ORM and cache APIs, so the event loop keeps
+serving other requests while one waits on the database. Enter and exit run
+their transaction in a single thread hop, as Django cannot open transactions
+in async code. DRF views cannot be async, so authentication and permissions
+follow StatelessJWTAuthentication and HasActiveSubscription here, and the
+responses keep the shape of the sync views. urls.py routes the hot endpoints
+to these views when settings.GYM_ASYNC_VIEWS is True, along with login, which
+awaits password hashing instead of blocking the thread that runs sync code.
+"""
+import json
+from functools import wraps
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import serializers, status
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from .authentication import StatelessJWTAuthentication
+from .cache import in_gym_cache
+from .conditional import add_conditional_headers, ain_gym_etag, amember_version, member_etag
+from .events import event_stream
+from .models import Member, GymSession
+from .permissions import HasActiveSubscription
+from .serializers import GymSessionSerializer, LoginSerializer, MemberSerializer
+from .sweeper import asweep_if_stale
+from .views import in_gym_expires_at, login_payload
+
+
+def member_view(query_param=None):
+    """
+    Decorate an async view to require an access token and an active
+    subscription (staff always pass). query_param names a query string
+    parameter holding a StreamToken, read when the Authorization header is
+    missing.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            authenticator = StatelessJWTAuthentication()
+            try:
+                user = await authenticator.aauthenticate(request, query_param=query_param)
+            except AuthenticationFailed as exc:
+                return unauthorized_response(authenticator, request, exc.detail)
+            if user is None:
+                return unauthorized_response(
+                    authenticator, request, "Authentication credentials were not provided."
+                )
+            if not user.is_staff and not await has_active_subscription(user):
+                return JsonResponse(HasActiveSubscription.message, status=status.HTTP_403_FORBIDDEN)
+
+            request.user = user
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def has_active_subscription(user):
+    check = getattr(user, "ahas_active_subscription", None)
+    return await check() if check else user.has_active_subscription
+
+
+def unauthorized_response(authenticator, request, detail):
+    """401 response in the shape DRF renders authentication errors"""
+    response = JsonResponse(
+        detail if isinstance(detail, dict) else {"detail": detail},
+        status=status.HTTP_401_UNAUTHORIZED
+    )
+    response["WWW-Authenticate"] = authenticator.authenticate_header(request)
+    return response
+
+
+def member_not_found_response():
+    """Response returned when the requested member does not exist"""
+    return JsonResponse({"error": "Member not found"}, status=status.HTTP_404_NOT_FOUND)
+
+
+@csrf_exempt
+@require_POST
+async def login(request):
+    """
+    Async LoginView: authenticate a member with phone number and password
+    The password hash is awaited on the hashing pool, so logins do not hold
+    up other requests while hashing
+    """
+    try:
+        data = json.loads(request.body) if request.content_type == "application/json" else request.POST
+    except ValueError:
+        return JsonResponse({"detail": "JSON parse error"}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = LoginSerializer()
+    try:
+        validated_data = await serializer.avalidate(serializer.to_internal_value(data))
+    except serializers.ValidationError as exc:
+        return JsonResponse(serializers.as_serializer_error(exc), status=status.HTTP_400_BAD_REQUEST)
+    return JsonResponse(login_payload(validated_data))
+
+
+@require_POST
+@member_view()
+async def member_enter(request, pk):
+    """
+    Async MemberEnterGymView: record member entry to the gym
+    """
+    return await change_gym_status(request, pk, Member.objects.aenter)
+
+
+@require_POST
+@member_view()
+async def member_exit(request, pk):
+    """
+    Async MemberExitGymView: record member exit from the gym
+    """
+    return await change_gym_status(request, pk, Member.objects.aexit)
+
+
+async def change_gym_status(request, pk, change):
+    # Check and close long sessions before processing
+    await asweep_if_stale()
+
+    # Check if user is trying to update their own record or is admin
+    if request.user.pk != pk and not request.user.is_staff:
+        if not await Member.objects.filter(pk=pk).aexists():
+            return member_not_found_response()
+        return JsonResponse(
+            {"error": "You can only update your own gym status"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    success, message = await change(pk)
+
+    if not success:
+        if not await Member.objects.filter(pk=pk).aexists():
+            return member_not_found_response()
+        return JsonResponse({"error": message}, status=status.HTTP_400_BAD_REQUEST)
+    return JsonResponse({"success": message})
+
+
+@require_GET
+@member_view()
+async def in_gym_members(request):
+    """
+    Async InGymMembersView: list all members currently in the gym
+    Supports If-None-Match, versioned by the occupancy revision
+    """
+    etag = quote_etag(await ain_gym_etag())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        # The list is the same for every caller, so it is served from a shared cache
+        members = await in_gym_cache.aget(build_in_gym_members)
+        response = JsonResponse({"count": len(members), "members": members})
+    return add_conditional_headers(response, etag)
+
+
+async def build_in_gym_members():
+    """Serialize the in-gym list, and work out when it goes stale without any write"""
+    now = timezone.now()
+    members = [member async for member in Member.objects.in_gym()]
+    data = [dict(member) for member in MemberSerializer(members, many=True).data]
+    return data, in_gym_expires_at(members, now)
+
+
+@require_GET
+@member_view()
+async def member_recent_sessions(request, id):
+    """
+    Async MemberRecentSessionsView: up to 50 most recent sessions of a member
+    Admin: Can view any member's sessions
+    Members: Can only view their own sessions
+    Supports If-None-Match, versioned by the member's revision
+    """
+    member = await amember_version(id)
+    if member is None:
+        return member_not_found_response()
+    if request.user.pk != id and not request.user.is_staff:
+        return JsonResponse(
+            {"error": "You can only view your own sessions"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    # Recording a session always writes the member row, bumping its revision
+    etag = quote_etag(member_etag("sessions", member))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        recent = GymSession.objects.with_member_name().filter(member_id=id).order_by("-entry_time")[:50]
+        sessions = [session async for session in recent]
+        # An overdue open session is always the member's most recent one
+        if member.is_session_overdue:
+            sessions = [GymSession.auto_closed(member.entry_time, member=member), *sessions][:50]
+        response = JsonResponse({
+            "count": len(sessions),
+            "sessions": GymSessionSerializer(sessions, many=True).data
+        })
+    return add_conditional_headers(response, etag)
+
+
+@require_GET
+@member_view(query_param="token")
+async def occupancy_stream(request):
+    """
+    Server-Sent Events stream of enter, exit, auto-close, reset and door events,
+    each with the live occupancy count
+    Accepts the access token in the Authorization header, or a token from
+    members/in-gym/stream/token/ as ?token= for EventSource clients that
+    cannot set headers
+    Accessible by any authenticated member with active subscription
+    Only served under ASGI: a WSGI server buffers the whole endless response
+    before sending any of it
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"error": "The event stream is only available when served through asgi.py"},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+
+    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
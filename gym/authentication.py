@@ -0,0 +1,200 @@
+"""
+Authentication backends and tokens for the gym API
+"""
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils.dateparse import parse_date
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+from .cache import TOKEN_VERSION_CACHE_KEY, forget_token_versions, member_cache
+from .models import Member, subscription_is_active
+
+
+class MemberRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the claims needed to authorize a member without a
+    database lookup. Access tokens derived from it copy the same claims.
+    """
+    @classmethod
+    def for_user(cls, user):
+        return add_member_claims(super().for_user(user), user)
+
+
+class StreamToken(Token):
+    """
+    Short-lived token for opening the event stream. EventSource clients cannot
+    set headers and pass it in the query string, where proxies and access
+    logs record it, so it expires long before a leaked URL is useful. It is
+    only checked when the stream opens.
+    """
+    token_type = "stream"
+    lifetime = timedelta(minutes=1)
+
+    @classmethod
+    def for_user(cls, user):
+        return add_member_claims(super().for_user(user), user)
+
+
+def add_member_claims(token, user):
+    """Copy the member's staff flag, subscription and token version into token"""
+    token["is_staff"] = user.is_staff
+    token["subscription_start"] = _isoformat(user.subscription_start)
+    token["subscription_end"] = _isoformat(user.subscription_end)
+    token["ver"] = user.token_version
+    return token
+
+
+def _isoformat(value):
+    """Serialize a subscription date claim, coercing datetimes to dates"""
+    if value is None:
+        return None
+    if hasattr(value, "date"):
+        value = value.date()
+    return value.isoformat()
+
+
+class MemberClaimsUser(TokenUser):
+    """
+    Member resolved from access token claims instead of the database
+    """
+    @cached_property
+    def subscription_start(self):
+        return parse_date(self.token.get("subscription_start") or "")
+
+    @cached_property
+    def subscription_end(self):
+        return parse_date(self.token.get("subscription_end") or "")
+
+    @cached_property
+    def has_active_subscription(self):
+        """
+        Check the subscription from the token claims. A subscription renewed
+        after the token was issued is confirmed with one database query.
+        """
+        if self.subscription_start and subscription_is_active(self.subscription_start, self.subscription_end):
+            return True
+        return Member.objects.filter(pk=self.pk).active().exists()
+
+    async def ahas_active_subscription(self):
+        """Async has_active_subscription for async views"""
+        if "has_active_subscription" not in self.__dict__:
+            if self.subscription_start and subscription_is_active(self.subscription_start, self.subscription_end):
+                active = True
+            else:
+                active = await Member.objects.filter(pk=self.pk).active().aexists()
+            self.__dict__["has_active_subscription"] = active
+        return self.has_active_subscription
+
+
+def get_token_version(member_id):
+    """
+    Return the member's current token version and whether the member may
+    still authenticate, caching the answer for GYM_TOKEN_VERSION_TTL seconds
+    """
+    key = TOKEN_VERSION_CACHE_KEY.format(member_id)
+    cached = cache.get(key)
+    if cached is None:
+        row = Member.objects.filter(pk=member_id).values_list("token_version", "is_active").first()
+        cached = row or (None, False)
+        cache.set(key, cached, timeout=getattr(settings, "GYM_TOKEN_VERSION_TTL", 300))
+    return cached
+
+
+async def aget_token_version(member_id):
+    """Async get_token_version for async views"""
+    key = TOKEN_VERSION_CACHE_KEY.format(member_id)
+    cached = await cache.aget(key)
+    if cached is None:
+        row = await Member.objects.filter(pk=member_id).values_list("token_version", "is_active").afirst()
+        cached = row or (None, False)
+        await cache.aset(key, cached, timeout=getattr(settings, "GYM_TOKEN_VERSION_TTL", 300))
+    return cached
+
+
+def revoke_tokens(member_ids):
+    """Invalidate every token issued so far to the given members"""
+    member_ids = list(member_ids)
+    if not member_ids:
+        return
+    Member.objects.filter(pk__in=member_ids).update(token_version=F("token_version") + 1)
+    forget_token_versions(*member_ids)
+    member_cache.invalidate(*member_ids)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that keeps recently authenticated Member objects in a
+    per-process LRU/TTL cache (settings.GYM_MEMBER_CACHE) instead of loading
+    the row on every request
+    """
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+        return member_cache.get(user_id, lambda: super(CachedJWTAuthentication, self).get_user(validated_token))
+
+
+class StatelessJWTAuthentication(CachedJWTAuthentication):
+    """
+    JWT authentication that builds request.user from the token claims
+    instead of loading the Member row on every request. Revoked tokens are
+    rejected by comparing the token version with a cached current version.
+    Tokens issued before the claims existed fall back to the cached database
+    lookup, as does every token when settings.GYM_STATELESS_AUTH is False.
+    """
+    def get_user(self, validated_token):
+        if not self.is_stateless(validated_token):
+            return super().get_user(validated_token)
+
+        user = MemberClaimsUser(validated_token)
+        return self.check_version(user, *get_token_version(user.pk))
+
+    async def aauthenticate(self, request, query_param=None):
+        """
+        Async authenticate() for async views, returning the user or None
+        without credentials. query_param names a query string parameter
+        holding a StreamToken, read when the Authorization header is missing.
+        """
+        header = self.get_header(request)
+        if header is None:
+            raw_token = request.GET.get(query_param) if query_param else None
+            if not raw_token:
+                return None
+            try:
+                stream_token = StreamToken(raw_token)
+            except TokenError as exc:
+                raise InvalidToken({"detail": str(exc), "code": "token_not_valid"})
+            user = MemberClaimsUser(stream_token)
+            return self.check_version(user, *await aget_token_version(user.pk))
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        if not self.is_stateless(validated_token):
+            return await sync_to_async(super().get_user)(validated_token)
+
+        user = MemberClaimsUser(validated_token)
+        return self.check_version(user, *await aget_token_version(user.pk))
+
+    @staticmethod
+    def is_stateless(validated_token):
+        return getattr(settings, "GYM_STATELESS_AUTH", True) and "ver" in validated_token
+
+    @staticmethod
+    def check_version(user, version, is_active):
+        """Reject tokens of deleted or inactive members, and revoked tokens"""
+        if version is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if not is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if version != user.token["ver"]:
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+        return user
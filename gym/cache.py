@@ -0,0 +1,222 @@
+"""
+Per-process cache of authenticated Member objects, the shared cache of
+the serialized in-gym member list, and the cached token versions
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils import timezone
+
+TOKEN_VERSION_CACHE_KEY = "gym:token_version:{}"
+
+
+def forget_token_versions(*member_ids):
+    """Drop cached token versions, so the next request reads the current one"""
+    cache.delete_many([TOKEN_VERSION_CACHE_KEY.format(pk) for pk in member_ids])
+
+DEFAULT_MEMBER_CACHE = {
+    "ENABLED": True,
+    "MAX_SIZE": 1024,
+    "TTL": 30,
+}
+
+
+def member_cache_settings():
+    """Return settings.GYM_MEMBER_CACHE merged over the defaults"""
+    return {**DEFAULT_MEMBER_CACHE, **getattr(settings, "GYM_MEMBER_CACHE", {})}
+
+
+class MemberCache:
+    """
+    Thread-safe LRU cache with a TTL for Member objects keyed by id.
+    Entries are dropped when a member is saved or changes gym status in this
+    process; the TTL bounds how stale a copy can be after a write made by
+    another process.
+    """
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, member_id, loader):
+        """Return the cached member, calling loader() on a miss"""
+        options = member_cache_settings()
+        if not options["ENABLED"]:
+            return loader()
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(member_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(member_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        member = loader()
+        with self._lock:
+            self._entries[member_id] = (member, now + options["TTL"])
+            self._entries.move_to_end(member_id)
+            while len(self._entries) > options["MAX_SIZE"]:
+                self._entries.popitem(last=False)
+        return member
+
+    def invalidate(self, *member_ids):
+        with self._lock:
+            for member_id in member_ids:
+                self._entries.pop(member_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+member_cache = MemberCache()
+
+
+DEFAULT_IN_GYM_CACHE = {
+    "ENABLED": True,
+    "ALIAS": "default",
+    "TIMEOUT": 60,
+}
+
+IN_GYM_GENERATION_KEY = "gym:in-gym:generation"
+IN_GYM_LIST_KEY = "gym:in-gym:list:{}"
+
+
+def in_gym_cache_settings():
+    """Return settings.GYM_IN_GYM_CACHE merged over the defaults"""
+    return {**DEFAULT_IN_GYM_CACHE, **getattr(settings, "GYM_IN_GYM_CACHE", {})}
+
+
+class InGymCache:
+    """
+    Cache of the serialized in-gym list in a Django cache backend
+    (settings.GYM_IN_GYM_CACHE["ALIAS"]). Use a backend shared by all workers,
+    such as the file, database or Redis cache, when running several processes.
+
+    Entries are stored under a generation number that invalidate() bumps, so
+    a list built while a member entered or left is never served afterwards.
+    An entry also expires when its first listed session becomes overdue.
+    Hit, miss and rebuild timings are counted per process.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rebuild_seconds = 0.0
+        self.last_rebuild_seconds = 0.0
+
+    def _backend(self):
+        return caches[in_gym_cache_settings()["ALIAS"]]
+
+    def get(self, builder):
+        """
+        Return the cached list, calling builder() on a miss. builder returns
+        (data, expires_at), where expires_at is the aware datetime after which
+        the data is stale without any write, or None.
+        """
+        options = in_gym_cache_settings()
+        if not options["ENABLED"]:
+            return builder()[0]
+
+        backend = self._backend()
+        generation = backend.get_or_set(IN_GYM_GENERATION_KEY, 0, timeout=None)
+        key = IN_GYM_LIST_KEY.format(generation)
+        data = backend.get(key)
+        if data is not None:
+            self._record_hit()
+            return data
+
+        started = time.perf_counter()
+        data, expires_at = builder()
+        elapsed = time.perf_counter() - started
+        timeout = self._timeout(options, expires_at)
+        if timeout > 0:
+            backend.set(key, data, timeout)
+        self._record_miss(elapsed)
+        return data
+
+    async def aget(self, builder):
+        """Async get() for async views; builder is a coroutine function"""
+        options = in_gym_cache_settings()
+        if not options["ENABLED"]:
+            return (await builder())[0]
+
+        backend = self._backend()
+        generation = await backend.aget_or_set(IN_GYM_GENERATION_KEY, 0, timeout=None)
+        key = IN_GYM_LIST_KEY.format(generation)
+        data = await backend.aget(key)
+        if data is not None:
+            self._record_hit()
+            return data
+
+        started = time.perf_counter()
+        data, expires_at = await builder()
+        elapsed = time.perf_counter() - started
+        timeout = self._timeout(options, expires_at)
+        if timeout > 0:
+            await backend.aset(key, data, timeout)
+        self._record_miss(elapsed)
+        return data
+
+    @staticmethod
+    def _timeout(options, expires_at):
+        timeout = options["TIMEOUT"]
+        if expires_at is not None:
+            timeout = min(timeout, (expires_at - timezone.now()).total_seconds())
+        return timeout
+
+    def _record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def _record_miss(self, elapsed):
+        with self._lock:
+            self.misses += 1
+            self.rebuild_seconds += elapsed
+            self.last_rebuild_seconds = elapsed
+
+    def invalidate(self):
+        """Drop the cached list for every process sharing the backend"""
+        if not in_gym_cache_settings()["ENABLED"]:
+            return
+        backend = self._backend()
+        try:
+            backend.incr(IN_GYM_GENERATION_KEY)
+        except ValueError:
+            backend.set(IN_GYM_GENERATION_KEY, 1, timeout=None)
+
+    def clear(self):
+        self.invalidate()
+        with self._lock:
+            self.hits = self.misses = 0
+            self.rebuild_seconds = self.last_rebuild_seconds = 0.0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "average_rebuild_ms": self.rebuild_seconds / self.misses * 1000 if self.misses else 0.0,
+                "last_rebuild_ms": self.last_rebuild_seconds * 1000,
+            }
+
+
+in_gym_cache = InGymCache()
@@ -0,0 +1,81 @@
+"""
+Conditional GET support for the polled read endpoints.
+
+Each view builds a cheap version token from revision counters that every
+write bumps. When the client's If-None-Match matches it, the view answers
+304 Not Modified without running its main queries or its serializer.
+"""
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from .models import Member, GymOccupancy
+
+
+class ConditionalGetMixin:
+    """
+    Mixin for DRF views whose GET response is fully determined by get_etag().
+    get_etag() runs after authentication and permission checks; returning
+    None skips conditional handling, e.g. when the object does not exist.
+    """
+    def get_etag(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag(request, *args, **kwargs)
+        if etag is None:
+            return super().get(request, *args, **kwargs)
+
+        etag = quote_etag(etag)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return add_conditional_headers(response, etag)
+
+
+def add_conditional_headers(response, etag):
+    """Set the quoted etag and the caching headers of a polled response"""
+    if response.status_code in (200, 304):
+        response["ETag"] = etag
+    # Clients must revalidate every poll, and the payload depends on the caller
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["Authorization"])
+    return response
+
+
+def member_version(pk):
+    """
+    Load the fields that version a member's payload, or None if the member
+    does not exist. The name is included for callers that render it.
+    """
+    return _member_versions(pk).first()
+
+
+async def amember_version(pk):
+    """Async member_version for async views"""
+    return await _member_versions(pk).afirst()
+
+
+def _member_versions(pk):
+    return Member.objects.only("id", "name", "revision", "is_in_gym", "entry_time").filter(pk=pk)
+
+
+def member_etag(prefix, member):
+    """
+    ETag of a payload derived from one member. Overdue sessions and
+    subscriptions change with time alone, so the overdue state and the
+    current date are part of the token.
+    """
+    overdue = int(member.is_session_overdue)
+    return f"{prefix}-{member.pk}-{member.revision}-{overdue}-{timezone.now().date()}"
+
+
+def in_gym_etag():
+    """ETag of the in-gym member list"""
+    overdue = Member.objects.overdue().count()
+    return f"in-gym-{GymOccupancy.objects.revision()}-{overdue}-{timezone.now().date()}"
+
+
+async def ain_gym_etag():
+    """Async in_gym_etag for async views"""
+    overdue = await Member.objects.overdue().acount()
+    return f"in-gym-{await GymOccupancy.objects.arevision()}-{overdue}-{timezone.now().date()}"
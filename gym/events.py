@@ -0,0 +1,172 @@
+"""
+Live gym events for the Server-Sent Events stream.
+
+The member_status_changed receiver publishes one event per committed enter,
+exit, auto-close, reset or door-event batch to a broker. The memory broker
+fans events out to the subscribers of this process. The cache broker is a
+stand-in for several worker processes: events go through a shared Django
+cache that every subscriber polls.
+"""
+import asyncio
+import json
+import threading
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import GymOccupancy
+from .signals import member_status_changed
+
+DEFAULT_EVENTS = {
+    "BACKEND": "memory",
+    "ALIAS": "default",
+    "QUEUE_SIZE": 100,
+    "HEARTBEAT": 15,
+    "POLL_INTERVAL": 1,
+}
+
+EVENT_SEQUENCE_KEY = "gym:events:sequence"
+EVENT_KEY = "gym:events:{}"
+
+
+def events_settings():
+    """Return settings.GYM_EVENTS merged over the defaults"""
+    return {**DEFAULT_EVENTS, **getattr(settings, "GYM_EVENTS", {})}
+
+
+class MemoryBroker:
+    """
+    In-process publisher. Each subscriber owns a bounded asyncio queue on its
+    event loop; publish() may be called from any thread. A subscriber that
+    falls behind loses its oldest events rather than blocking the publisher.
+    """
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            loop, queue = subscriber
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                # The subscriber's event loop has closed
+                with self._lock:
+                    self._subscribers.discard(subscriber)
+
+    @staticmethod
+    def _deliver(queue, event):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    async def subscribe(self):
+        """Yield published events, or None after HEARTBEAT idle seconds"""
+        options = events_settings()
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=options["QUEUE_SIZE"]))
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber[1].get(), options["HEARTBEAT"])
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+
+class CacheBroker:
+    """
+    Publisher shared by several processes through a Django cache backend
+    (GYM_EVENTS["ALIAS"]). Events are numbered with an atomic counter and kept
+    for a minute; subscribers poll for new numbers every POLL_INTERVAL seconds.
+    """
+    EVENT_TIMEOUT = 60
+
+    def _backend(self):
+        return caches[events_settings()["ALIAS"]]
+
+    def has_subscribers(self):
+        # Subscribers may live in other processes
+        return True
+
+    def publish(self, event):
+        backend = self._backend()
+        backend.add(EVENT_SEQUENCE_KEY, 0, timeout=None)
+        sequence = backend.incr(EVENT_SEQUENCE_KEY)
+        backend.set(EVENT_KEY.format(sequence), event, timeout=self.EVENT_TIMEOUT)
+
+    async def subscribe(self):
+        """Yield published events, or None after HEARTBEAT idle seconds"""
+        options = events_settings()
+        backend = self._backend()
+        last = await backend.aget(EVENT_SEQUENCE_KEY, 0)
+        idle = 0
+        while True:
+            await asyncio.sleep(options["POLL_INTERVAL"])
+            latest = await backend.aget(EVENT_SEQUENCE_KEY, 0)
+            if latest <= last:
+                idle += options["POLL_INTERVAL"]
+                if idle >= options["HEARTBEAT"]:
+                    idle = 0
+                    yield None
+                continue
+
+            keys = [EVENT_KEY.format(sequence) for sequence in range(last + 1, latest + 1)]
+            found = await backend.aget_many(keys)
+            for key in keys:
+                if key in found:
+                    yield found[key]
+            last, idle = latest, 0
+
+
+_brokers = {}
+
+
+def get_broker():
+    """Return the broker selected by GYM_EVENTS["BACKEND"]"""
+    backend = events_settings()["BACKEND"]
+    if backend not in _brokers:
+        _brokers[backend] = CacheBroker() if backend == "cache" else MemoryBroker()
+    return _brokers[backend]
+
+
+def format_event(event):
+    """Encode an event as a Server-Sent Events message"""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def occupancy_event(event_type="occupancy", member_ids=()):
+    """Build an event carrying the current occupancy count"""
+    return {
+        "type": event_type,
+        "member_ids": list(member_ids),
+        "occupancy": GymOccupancy.objects.current(),
+        "time": timezone.now().isoformat(),
+    }
+
+
+async def event_stream():
+    """
+    Yield Server-Sent Events messages: the current occupancy first, then every
+    published event. Each event carries the absolute occupancy, so a client
+    that misses one is corrected by the next. Comments keep idle connections open.
+    """
+    yield format_event(await sync_to_async(occupancy_event)())
+    async for event in get_broker().subscribe():
+        yield format_event(event) if event is not None else ": keep-alive\n\n"
+
+
+@receiver(member_status_changed)
+def publish_status_change(sender, member_ids, reason="update", **kwargs):
+    broker = get_broker()
+    if broker.has_subscribers():
+        broker.publish(occupancy_event(reason, member_ids))
@@ -0,0 +1,50 @@
+"""
+Streaming export of gym sessions as CSV or NDJSON.
+
+Rows are read with values_list().iterator(), so no model instances are built
+and only one database chunk is held in memory at a time, whatever the size
+of the export.
+"""
+import csv
+import json
+from .models import GymSession
+
+EXPORT_FORMATS = ("csv", "ndjson")
+CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_COLUMNS = ("id", "member_id", "member_name", "entry_time", "exit_time", "duration")
+# Database lookups for EXPORT_COLUMNS, in the same order
+EXPORT_FIELDS = ("id", "member_id", "member__name", "entry_time", "exit_time", "duration")
+
+
+class _Echo:
+    """File-like object whose write() returns the line, so csv.writer can stream"""
+    def write(self, value):
+        return value
+
+
+def session_rows(queryset=None, chunk_size=2000):
+    """Yield session tuples in EXPORT_COLUMNS order, oldest entry first"""
+    queryset = GymSession.objects.all() if queryset is None else queryset
+    rows = queryset.order_by("entry_time", "id").values_list(*EXPORT_FIELDS)
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield row[:3] + tuple(value.isoformat() if value else None for value in row[3:5]) + row[5:]
+
+
+def csv_lines(rows):
+    """Yield a header line and one CSV line per row"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows):
+    """Yield one JSON object per line for each row"""
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n"
+
+
+def export_lines(export_format, queryset=None, chunk_size=2000):
+    """Yield the lines of a session export in the given format"""
+    rows = session_rows(queryset, chunk_size=chunk_size)
+    return csv_lines(rows) if export_format == "csv" else ndjson_lines(rows)
@@ -0,0 +1,108 @@
+"""
+Query-string filters shared by the session endpoints
+"""
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+
+def parse_time_bound(value, param, end=False):
+    """
+    Parse a ?start= / ?end= value given as a date or an ISO datetime.
+    A bare end date includes that whole day.
+    """
+    try:
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        day = moment = None
+
+    if day:
+        moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    if moment is None:
+        raise ValidationError({param: "Use YYYY-MM-DD or an ISO 8601 datetime."})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def session_filters(query_params):
+    """
+    Parse the member and entry-time range filters of the session endpoints.
+    Returns (member_id, start, end); missing filters are None.
+    """
+    member_id = query_params.get("member")
+    if member_id is not None:
+        try:
+            member_id = int(member_id)
+        except ValueError:
+            raise ValidationError({"member": "A valid member id is required."})
+
+    start = query_params.get("start")
+    end = query_params.get("end")
+    return (
+        member_id,
+        parse_time_bound(start, "start") if start else None,
+        parse_time_bound(end, "end", end=True) if end else None,
+    )
+
+
+def filter_by_entry_time(queryset, member_field, member_id=None, start=None, end=None):
+    """Apply the parsed session filters to a GymSession or Member queryset"""
+    if member_id is not None:
+        queryset = queryset.filter(**{member_field: member_id})
+    if start is not None:
+        queryset = queryset.filter(entry_time__gte=start)
+    if end is not None:
+        queryset = queryset.filter(entry_time__lt=end)
+    return queryset
+
+
+def stats_date_range(query_params, default_days=30, max_days=366):
+    """
+    Parse the ?start= / ?end= dates of the rollup endpoints, both inclusive.
+    Defaults to the last default_days days and caps the range at max_days
+    so every request reads a bounded number of rollup rows.
+    """
+    today = timezone.localdate()
+    days = {}
+    for param in ("start", "end"):
+        value = query_params.get(param)
+        if not value:
+            continue
+        try:
+            days[param] = parse_date(value)
+        except ValueError:
+            days[param] = None
+        if days[param] is None:
+            raise ValidationError({param: "Use YYYY-MM-DD."})
+
+    end = days.get("end") or today
+    start = days.get("start") or end - timedelta(days=default_days - 1)
+    if start > end:
+        raise ValidationError({"start": "Start must not be after end."})
+    if (end - start).days >= max_days:
+        raise ValidationError({"start": f"The range cannot exceed {max_days} days."})
+    return start, end
+
+
+def day_range_bounds(first_day, last_day):
+    """Return the aware [start, end) datetimes covering local days first_day to last_day"""
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+    return start, end
+
+
+def interval_minutes(query_params, default=15):
+    """Parse ?interval= as a whole number of minutes between 1 and one day"""
+    value = query_params.get("interval")
+    if value is None:
+        return default
+    try:
+        minutes = int(value)
+    except ValueError:
+        minutes = 0
+    if not 1 <= minutes <= 24 * 60:
+        raise ValidationError({"interval": "Use a whole number of minutes between 1 and 1440."})
+    return minutes
@@ -0,0 +1,118 @@
+"""
+Password hashers tuned for login throughput, and a bounded hashing pool
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, ScryptPasswordHasher, check_password
+)
+
+DEFAULT_HASHER_PARAMS = {
+    # Argon2id, OWASP minimum: 19 MiB memory, 2 passes, 1 lane
+    "ARGON2_TIME_COST": 2,
+    "ARGON2_MEMORY_COST": 19 * 1024,
+    "ARGON2_PARALLELISM": 1,
+    # scrypt, OWASP's 16 MiB variant (N=2^14, r=8, p=5), used without argon2-cffi
+    "SCRYPT_WORK_FACTOR": 2**14,
+    "SCRYPT_BLOCK_SIZE": 8,
+    "SCRYPT_PARALLELISM": 5,
+}
+
+
+def hasher_params():
+    """Return settings.GYM_PASSWORD_HASHER_PARAMS merged over the defaults"""
+    return {**DEFAULT_HASHER_PARAMS, **getattr(settings, "GYM_PASSWORD_HASHER_PARAMS", {})}
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id hasher with parameters from settings.GYM_PASSWORD_HASHER_PARAMS.
+    Requires the argon2-cffi package.
+    """
+    @property
+    def time_cost(self):
+        return hasher_params()["ARGON2_TIME_COST"]
+
+    @property
+    def memory_cost(self):
+        return hasher_params()["ARGON2_MEMORY_COST"]
+
+    @property
+    def parallelism(self):
+        return hasher_params()["ARGON2_PARALLELISM"]
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """
+    scrypt hasher with parameters from settings.GYM_PASSWORD_HASHER_PARAMS
+    """
+    @property
+    def work_factor(self):
+        return hasher_params()["SCRYPT_WORK_FACTOR"]
+
+    @property
+    def block_size(self):
+        return hasher_params()["SCRYPT_BLOCK_SIZE"]
+
+    @property
+    def parallelism(self):
+        return hasher_params()["SCRYPT_PARALLELISM"]
+
+    @property
+    def maxmem(self):
+        # hashlib refuses anything above 32 MiB unless maxmem is raised
+        return 2 * 128 * self.work_factor * self.block_size
+
+
+_hash_pool = None
+
+
+def get_hash_pool():
+    """Thread pool that caps how many passwords are hashed at once"""
+    global _hash_pool
+    if _hash_pool is None:
+        workers = getattr(settings, "GYM_LOGIN_HASH_WORKERS", None) or os.cpu_count() or 1
+        _hash_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gym-login-hash")
+    return _hash_pool
+
+
+def check_member_password(member, raw_password):
+    """
+    Verify a member's password on the bounded hashing pool, then rehash it
+    with the preferred hasher when it was stored with another hasher or
+    older parameters. Only the hashing runs on the pool; the database write
+    stays on the calling thread.
+    """
+    needs_rehash = []
+    future = get_hash_pool().submit(
+        check_password, raw_password, member.password, needs_rehash.append
+    )
+    if not future.result():
+        return False
+
+    if needs_rehash:
+        member.set_password(raw_password)
+        member.save(update_fields=["password"])
+    return True
+
+
+async def acheck_member_password(member, raw_password):
+    """
+    Async check_member_password for the async login view. The event loop
+    awaits the hashing pool instead of blocking on it, so a login does not
+    stall other requests for the length of a hash, as it does when a sync
+    view runs in ASGI's single thread for sync code.
+    """
+    needs_rehash = []
+    pool = get_hash_pool()
+    if not await asyncio.wrap_future(
+        pool.submit(check_password, raw_password, member.password, needs_rehash.append)
+    ):
+        return False
+
+    if needs_rehash:
+        await asyncio.wrap_future(pool.submit(member.set_password, raw_password))
+        await member.asave(update_fields=["password"])
+    return True
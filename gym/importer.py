@@ -0,0 +1,163 @@
+"""
+Bulk member import used by the import_members command and the admin endpoint.
+
+Rows are consumed as a stream and processed in chunks: each chunk is
+validated, its passwords are hashed across a process pool, and its new and
+updated members are written with one bulk_create each. Rows that fail are
+reported by row number instead of aborting the import.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from .authentication import revoke_tokens
+from .models import BUMP_REVISION, GymOccupancy, Member, access_narrowed, notify_status_changed, subscription_is_active
+from .serializers import MemberImportSerializer
+
+# Columns updated on existing members when update_existing is set
+UPDATE_FIELDS = ["name", "subscription_start", "subscription_end", "subscription_active"]
+
+
+def _setup_worker():
+    """Make Django usable in spawned pool workers (forked ones inherit it)"""
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _chunks(rows, size):
+    """Yield lists of (row_number, row), numbering data rows after the header"""
+    numbered = enumerate(rows, start=2)
+    while chunk := list(islice(numbered, size)):
+        yield chunk
+
+
+def _clean_row(row):
+    """Drop blank cells so optional columns may be left empty"""
+    return {
+        key.strip(): value.strip()
+        for key, value in row.items()
+        if key and isinstance(value, str) and value.strip()
+    }
+
+
+def import_members(rows, chunk_size=500, workers=None, update_existing=False):
+    """
+    Import members from an iterable of dicts (e.g. a csv.DictReader)
+
+    Existing phone numbers are skipped, or have their name and subscription
+    updated when update_existing is set. Returns a dict with created,
+    updated and skipped counts and a list of per-row errors.
+    """
+    workers = workers or getattr(settings, "GYM_IMPORT_WORKERS", None) or os.cpu_count() or 1
+    result = {"created": 0, "updated": 0, "skipped": 0, "errors": []}
+    seen = set()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+        for chunk in _chunks(rows, max(1, chunk_size)):
+            _import_chunk(chunk, pool, workers, update_existing, seen, result)
+    return result
+
+
+def _import_chunk(chunk, pool, workers, update_existing, seen, result):
+    """Validate, hash and write one chunk of rows"""
+    today = timezone.now().date()
+    valid = []
+    for row_number, row in chunk:
+        serializer = MemberImportSerializer(data=_clean_row(row))
+        if not serializer.is_valid():
+            result["errors"].append({"row": row_number, "errors": serializer.errors})
+            continue
+        data = serializer.validated_data
+        if data["phone_number"] in seen:
+            result["errors"].append({
+                "row": row_number,
+                "errors": {"phone_number": ["Duplicate phone number in this file."]},
+            })
+            continue
+        seen.add(data["phone_number"])
+        valid.append(data)
+
+    if not valid:
+        return
+
+    existing = {
+        phone_number: (pk, start, end)
+        for phone_number, pk, start, end in Member.objects.filter(
+            phone_number__in=[data["phone_number"] for data in valid]
+        ).values_list("phone_number", "pk", "subscription_start", "subscription_end")
+    }
+    if not update_existing:
+        result["skipped"] += sum(data["phone_number"] in existing for data in valid)
+        valid = [data for data in valid if data["phone_number"] not in existing]
+
+    # Existing members keep their password, so only new members are hashed
+    new_rows = [data for data in valid if data["phone_number"] not in existing]
+    hashes = pool.map(
+        make_password,
+        [data["password"] for data in new_rows],
+        chunksize=max(1, len(new_rows) // workers),
+    )
+    passwords = dict(zip((data["phone_number"] for data in new_rows), hashes))
+
+    new_members = []
+    updated_members = []
+    shortened = []
+    for data in valid:
+        start = data.get("subscription_start") or today
+        end = data.get("subscription_end")
+        if data["phone_number"] in existing:
+            # Columns left blank keep the member's current dates
+            pk, old_start, old_end = existing[data["phone_number"]]
+            start = data.get("subscription_start") or old_start
+            end = data.get("subscription_end", old_end)
+            if access_narrowed(
+                {"subscription_start": old_start, "subscription_end": old_end},
+                {"subscription_start": start, "subscription_end": end},
+            ):
+                shortened.append(pk)
+        member = Member(
+            phone_number=data["phone_number"],
+            name=data["name"],
+            password=passwords.get(data["phone_number"], ""),
+            subscription_start=start,
+            subscription_end=end,
+            subscription_active=subscription_is_active(start, end, today),
+        )
+        (updated_members if data["phone_number"] in existing else new_members).append(member)
+
+    created = 0
+    with transaction.atomic():
+        if new_members:
+            # A member registered since the existence check is skipped by the database
+            Member.objects.bulk_create(new_members, ignore_conflicts=True)
+            # so only rows holding the freshly salted hash were inserted here
+            created = sum(
+                passwords[phone_number] == password
+                for phone_number, password in Member.objects.filter(
+                    phone_number__in=passwords
+                ).values_list("phone_number", "password")
+            )
+            result["skipped"] += len(new_members) - created
+        if updated_members:
+            Member.objects.bulk_create(
+                updated_members,
+                update_conflicts=True,
+                unique_fields=["phone_number"],
+                update_fields=UPDATE_FIELDS,
+            )
+            updated_ids = [existing[member.phone_number][0] for member in updated_members]
+            Member.objects.filter(pk__in=updated_ids).update(revision=BUMP_REVISION)
+            if Member.objects.filter(pk__in=updated_ids, is_in_gym=True).exists():
+                # Updated in-gym members change the in-gym list, versioned by the occupancy revision
+                GymOccupancy.objects.touch()
+            # Tokens carry the subscription dates, so shortened ones must be revoked
+            revoke_tokens(shortened)
+            notify_status_changed(updated_ids)
+
+    result["created"] += created
+    result["updated"] += len(updated_members)
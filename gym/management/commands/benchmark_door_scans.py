@@ -0,0 +1,134 @@
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import AsyncRequestFactory, RequestFactory
+from django.utils import timezone
+from datetime import timedelta
+from gym import async_views, views
+from gym.authentication import MemberRefreshToken
+from gym.models import Member
+
+class Command(BaseCommand):
+    """
+    Management command to compare enter/exit throughput of the sync views
+    served by threads, as under WSGI, with the async views served from one
+    event loop, as under ASGI
+
+    Each of --concurrency scanners repeatedly enters and exits its own member.
+    Three setups are measured: the sync views on a thread per scanner (wsgi),
+    the sync views behind the thread hop ASGI adds for them (asgi-sync), and
+    the async views (asgi-async). Runs against a temporary test database.
+    """
+    help = 'Benchmark door scans/sec for sync views under WSGI and async views under ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scans',
+            type=int,
+            default=200,
+            help='Number of enter/exit scans per setup (default: 200)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Number of concurrent scanners (default: 8)',
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        rounds = max(1, options['scans'] // (2 * concurrency))
+        old_name = connection.settings_dict['NAME']
+        with tempfile.TemporaryDirectory() as directory:
+            if connection.vendor == 'sqlite':
+                # In-memory SQLite locks whole tables between threads, and
+                # deferred transactions fail instead of waiting for the write lock
+                connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+                connection.settings_dict['OPTIONS'].update(transaction_mode='IMMEDIATE', timeout=30)
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                scanners = self.create_scanners(concurrency)
+                self.stdout.write(f'{rounds * 2 * concurrency} scans per setup, {concurrency} concurrent scanner(s)')
+                self.report('wsgi', *self.run_threads(scanners, rounds))
+                self.report('asgi-sync', *asyncio.run(self.run_event_loop(scanners, rounds, use_async_views=False)))
+                self.report('asgi-async', *asyncio.run(self.run_event_loop(scanners, rounds, use_async_views=True)))
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def create_scanners(self, count):
+        """Create one member per scanner, with the Authorization header it scans with"""
+        today = timezone.now().date()
+        scanners = []
+        for index in range(count):
+            member = Member.objects.create_user(
+                phone_number=f'9{index:09d}',
+                name=f'Benchmark Member {index}',
+                subscription_start=today,
+                subscription_end=today + timedelta(days=30),
+            )
+            token = MemberRefreshToken.for_user(member).access_token
+            scanners.append((member.pk, {'authorization': f'Bearer {token}'}))
+        return scanners
+
+    def run_threads(self, scanners, rounds):
+        factory = RequestFactory()
+        enter_view, exit_view = views.MemberEnterGymView.as_view(), views.MemberExitGymView.as_view()
+
+        def scan(scanner):
+            pk, headers = scanner
+            timings, errors = [], 0
+            try:
+                for _ in range(rounds):
+                    for view in (enter_view, exit_view):
+                        started = time.perf_counter()
+                        response = view(factory.post('/', headers=headers), pk=pk)
+                        timings.append(time.perf_counter() - started)
+                        errors += response.status_code != 200
+            finally:
+                connections.close_all()
+            return timings, errors
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(scanners)) as pool:
+            results = list(pool.map(scan, scanners))
+        return time.perf_counter() - started, results
+
+    async def run_event_loop(self, scanners, rounds, use_async_views):
+        factory = AsyncRequestFactory()
+        if use_async_views:
+            enter_view, exit_view = async_views.member_enter, async_views.member_exit
+        else:
+            # ASGIHandler runs sync views in a single thread-sensitive executor
+            enter_view = sync_to_async(views.MemberEnterGymView.as_view())
+            exit_view = sync_to_async(views.MemberExitGymView.as_view())
+
+        async def scan(scanner):
+            pk, headers = scanner
+            timings, errors = [], 0
+            for _ in range(rounds):
+                for view in (enter_view, exit_view):
+                    started = time.perf_counter()
+                    response = await view(factory.post('/', headers=headers), pk=pk)
+                    timings.append(time.perf_counter() - started)
+                    errors += response.status_code != 200
+            return timings, errors
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(scan(scanner) for scanner in scanners))
+        return time.perf_counter() - started, results
+
+    def report(self, setup, elapsed, results):
+        timings = sorted(timing for scanner_timings, _ in results for timing in scanner_timings)
+        errors = sum(scanner_errors for _, scanner_errors in results)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f'{setup:<12} {len(timings) / elapsed:8.1f} scans/sec '
+            f'{statistics.median(timings) * 1000:8.1f} ms p50 {p95 * 1000:8.1f} ms p95 '
+            f'{errors} error(s)'
+        )
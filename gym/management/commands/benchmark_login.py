@@ -0,0 +1,55 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.hashers import check_password, get_hashers
+from django.core.management.base import BaseCommand
+
+class Command(BaseCommand):
+    """
+    Management command to benchmark password verification, the CPU-bound
+    part of login, for every configured password hasher
+
+    Reports milliseconds per login and logins/sec per core, so hasher
+    parameters can be tuned against the expected login burst.
+    """
+    help = 'Benchmark logins/sec per core for the configured password hashers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--logins',
+            type=int,
+            default=20,
+            help='Number of password checks per hasher (default: 20)',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=1,
+            help='Number of concurrent threads (default: 1)',
+        )
+
+    def handle(self, *args, **options):
+        logins = max(1, options['logins'])
+        threads = max(1, options['threads'])
+        cores = min(threads, os.cpu_count() or 1)
+        password = 'benchmark-password'
+
+        self.stdout.write(f'{logins} logins per hasher on {threads} thread(s), {cores} core(s)')
+        for hasher in get_hashers():
+            try:
+                encoded = hasher.encode(password, hasher.salt())
+            except ValueError as exc:
+                # Optional hasher library is not installed
+                self.stdout.write(f'{hasher.algorithm:<16} skipped: {exc}')
+                continue
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                results = list(pool.map(lambda _: check_password(password, encoded), range(logins)))
+            elapsed = time.perf_counter() - started
+            assert all(results)
+
+            self.stdout.write(
+                f'{hasher.algorithm:<16} {elapsed / logins * 1000 * threads:8.1f} ms/login '
+                f'{logins / elapsed / cores:8.1f} logins/sec/core'
+            )
@@ -0,0 +1,38 @@
+import time
+from django.core.management.base import BaseCommand
+from gym.sweeper import sweep
+
+class Command(BaseCommand):
+    """
+    Management command to close sessions that exceeded the time limit
+
+    Run it once from cron, or keep it running with --loop so request
+    handlers never have to close sessions themselves.
+    """
+    help = 'Close gym sessions that have been open for more than 1.5 hours'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep sweeping on a fixed cadence instead of running once',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Seconds to wait between sweeps in --loop mode (default: 60)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                closed_count = sweep()
+                self.stdout.write(
+                    self.style.SUCCESS(f'Closed {closed_count} sessions that exceeded 1.5 hours')
+                )
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Sweeper stopped')
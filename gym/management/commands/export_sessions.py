@@ -0,0 +1,64 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+from gym.exporter import EXPORT_FORMATS, export_lines
+from gym.filters import parse_time_bound, filter_by_entry_time
+from gym.models import GymSession
+
+class Command(BaseCommand):
+    """
+    Management command to export gym sessions as CSV or NDJSON
+
+    Sessions are streamed from the database in chunks and written as they
+    are read, so memory use does not grow with the number of sessions.
+    """
+    help = 'Exports gym sessions as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output-format',
+            choices=EXPORT_FORMATS,
+            default='csv',
+            help='Output format (default: csv)',
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write to (default: standard output)',
+        )
+        parser.add_argument('--start', help='Only sessions entered on or after this date or datetime')
+        parser.add_argument('--end', help='Only sessions entered before this datetime, or on or before this date')
+        parser.add_argument('--member', type=int, help='Only sessions of this member id')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Number of rows fetched from the database at a time (default: 2000)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_time_bound(options['start'], 'start') if options['start'] else None
+            end = parse_time_bound(options['end'], 'end', end=True) if options['end'] else None
+        except ValidationError as exc:
+            raise CommandError(exc.detail)
+        sessions = filter_by_entry_time(GymSession.objects.all(), 'member_id', options['member'], start, end)
+
+        started = time.monotonic()
+        lines = export_lines(options['output_format'], sessions, chunk_size=max(1, options['chunk_size']))
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                count = self.write_lines(lines, output)
+        else:
+            count = self.write_lines(lines, self.stdout)
+
+        if options['output_format'] == 'csv':
+            count -= 1  # header
+        elapsed = time.monotonic() - started
+        self.stderr.write(self.style.SUCCESS(f'Exported {count} sessions in {elapsed:.2f}s'))
+
+    def write_lines(self, lines, output):
+        count = 0
+        for line in lines:
+            output.write(line)
+            count += 1
+        return count
@@ -0,0 +1,63 @@
+import csv
+import time
+from django.core.management.base import BaseCommand, CommandError
+from gym.importer import import_members
+
+class Command(BaseCommand):
+    """
+    Management command to import members from a CSV file
+
+    The file needs a header row with phone_number, name and password
+    columns; subscription_start and subscription_end are optional. Rows are
+    streamed and written in chunks, and failing rows are reported by row
+    number without stopping the import.
+    """
+    help = 'Imports members from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the CSV file')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of rows validated and written per chunk (default: 500)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Number of password hashing processes (default: number of CPU cores)',
+        )
+        parser.add_argument(
+            '--update-existing',
+            action='store_true',
+            help='Update name and subscription of members that already exist',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as csv_file:
+                result = import_members(
+                    csv.DictReader(csv_file),
+                    chunk_size=options['chunk_size'],
+                    workers=options['workers'],
+                    update_existing=options['update_existing'],
+                )
+        except OSError as exc:
+            raise CommandError(f'Could not read {options["path"]}: {exc}')
+
+        for error in result['errors']:
+            details = '; '.join(
+                f'{field}: {" ".join(str(message) for message in messages)}'
+                for field, messages in error['errors'].items()
+            )
+            self.stderr.write(f'Row {error["row"]}: {details}')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Imported members: {result["created"]} created, {result["updated"]} updated, '
+                f'{result["skipped"]} skipped, {len(result["errors"])} failed ({elapsed:.2f}s)'
+            )
+        )
@@ -1,6 +1,8 @@
+import time
 from django.core.management.base import BaseCommand
+from django.db.models import Q
 from django.utils import timezone
-from gym.models import Member
+from gym.models import Member, SESSION_TIME_LIMIT
 
 class Command(BaseCommand):
     """
@@ -9,24 +11,29 @@ class Command(BaseCommand):
     This command is intended to be run daily at midnight to ensure
     that any members who forgot to check out are properly logged out
     and their sessions are recorded.
+    
+    All closing sessions are created with one bulk insert and the status
+    is cleared with one UPDATE in a single transaction. Each session ends
+    at the session time limit or at midnight, whichever comes first, no
+    matter when cron runs the command. Members who entered after midnight
+    are left in the gym.
     """
     help = 'Reset is_in_gym status for all members at midnight'
 
     def handle(self, *args, **options):
-        # Get all members who are currently in the gym
-        members_in_gym = Member.objects.filter(is_in_gym=True)
-        count = members_in_gym.count()
+        started = time.monotonic()
+        midnight = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
         
-        # For each member in the gym, create a session and set is_in_gym to False
-        for member in members_in_gym:
-            if member.entry_time:
-                # This will create a session and set is_in_gym to False
-                member.exit_gym()  
-            else:
-                # If no entry time is recorded, just set is_in_gym to False
-                member.is_in_gym = False
-                member.save()
+        # Members who are in the gym since before midnight, or have no entry time
+        members = Member.objects.filter(Q(entry_time__lt=midnight) | Q(entry_time__isnull=True))
+        count, sessions = members.close_open_sessions(
+            lambda entry_time: min(entry_time + SESSION_TIME_LIMIT, midnight)
+        )
         
+        elapsed = time.monotonic() - started
         self.stdout.write(
-            self.style.SUCCESS(f'Successfully reset is_in_gym status for {count} members')
+            self.style.SUCCESS(
+                f'Successfully reset is_in_gym status for {count} members '
+                f'({sessions} sessions recorded in {elapsed:.2f}s)'
+            )
         )
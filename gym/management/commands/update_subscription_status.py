@@ -1,25 +1,63 @@
+import time
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 from gym.models import Member
 
 class Command(BaseCommand):
     """
     Management command to update subscription status for all members
     
-    This command is intended to be run daily to ensure that the
-    has_active_subscription property is up-to-date for all members.
-    It's useful for keeping track of expired subscriptions.
+    This command is intended to be run daily to ensure that the stored
+    subscription_active column matches has_active_subscription.
+    Members are processed in primary key batches, each in its own short
+    transaction, and only members whose status changed are written.
     """
     help = 'Updates subscription status for all members'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of members checked per batch (default: 1000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many members would change without writing',
+        )
+
     def handle(self, *args, **options):
-        members = Member.objects.all()
-        count = 0
-        
-        for member in members:
-            # Save will trigger the logic to update has_active_subscription
-            member.save()
-            count += 1
-            
+        batch_size = max(1, options['batch_size'])
+        dry_run = options['dry_run']
+        today = timezone.now().date()
+        started = time.monotonic()
+        scanned = activated = expired = 0
+        last_pk = 0
+
+        while True:
+            # Walk the primary key in order so memory stays bounded by the batch size
+            pks = list(
+                Member.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+
+            batch = Member.objects.filter(pk__gte=pks[0], pk__lte=pks[-1])
+            batch_activated, batch_expired = batch.refresh_subscription_status(today=today, dry_run=dry_run)
+            scanned += len(pks)
+            activated += batch_activated
+            expired += batch_expired
+            last_pk = pks[-1]
+
+        elapsed = time.monotonic() - started
+        rate = scanned / elapsed if elapsed else scanned
+        prefix = 'Dry run: would update' if dry_run else 'Successfully updated'
         self.stdout.write(
-            self.style.SUCCESS(f'Successfully updated subscription status for {count} members')
+            self.style.SUCCESS(
+                f'{prefix} subscription status: {activated} activated, {expired} expired '
+                f'({scanned} members checked in {elapsed:.2f}s, {rate:.0f} rows/sec)'
+            )
         )
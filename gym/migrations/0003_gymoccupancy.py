@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gym", "0002_alter_gymsession_options"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GymOccupancy",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("count", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "verbose_name_plural": "gym occupancy",
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("gym", "0003_gymoccupancy"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="gymsession",
+            index=models.Index(
+                fields=["member", "-entry_time"], name="gym_session_member_entry_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="gymsession",
+            index=models.Index(
+                fields=["-entry_time", "-id"], name="gym_session_entry_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="member",
+            index=models.Index(
+                condition=models.Q(("is_in_gym", True)),
+                fields=["entry_time"],
+                name="gym_member_in_gym_entry_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="member",
+            index=models.Index(
+                fields=["subscription_end"], name="gym_member_sub_end_idx"
+            ),
+        ),
+    ]
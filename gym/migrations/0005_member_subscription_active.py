@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:47
+
+from django.db import migrations, models
+from django.db.models import Q
+from django.utils import timezone
+
+
+def backfill_subscription_active(apps, schema_editor):
+    Member = apps.get_model("gym", "Member")
+    today = timezone.now().date()
+    Member.objects.filter(
+        Q(subscription_start__gt=today) | Q(subscription_end__lt=today)
+    ).update(subscription_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gym", "0004_add_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="member",
+            name="subscription_active",
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+        migrations.RunPython(
+            backfill_subscription_active, migrations.RunPython.noop
+        ),
+    ]
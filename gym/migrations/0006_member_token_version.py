@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gym", "0005_member_subscription_active"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="member",
+            name="token_version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
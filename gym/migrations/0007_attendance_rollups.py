@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gym", "0006_member_token_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HourlyOccupancy",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hour", models.DateTimeField(unique=True)),
+                ("visits", models.PositiveIntegerField(default=0)),
+                (
+                    "total_duration",
+                    models.FloatField(default=0, help_text="Total duration in minutes"),
+                ),
+                ("occupied_minutes", models.FloatField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "hourly occupancy",
+                "ordering": ["hour"],
+            },
+        ),
+        migrations.CreateModel(
+            name="DailyMemberStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("visits", models.PositiveIntegerField(default=0)),
+                (
+                    "total_duration",
+                    models.FloatField(default=0, help_text="Total duration in minutes"),
+                ),
+                (
+                    "member",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "daily member stats",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("member", "date"), name="gym_daily_member_stats_unique"
+                    )
+                ],
+            },
+        ),
+    ]
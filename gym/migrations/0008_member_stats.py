@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gym", "0007_attendance_rollups"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MemberStats",
+            fields=[
+                (
+                    "member",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("total_visits", models.PositiveIntegerField(default=0)),
+                (
+                    "total_duration",
+                    models.FloatField(default=0, help_text="Total duration in minutes"),
+                ),
+                ("last_visit_date", models.DateField(blank=True, null=True)),
+                ("current_streak", models.PositiveIntegerField(default=0)),
+                ("longest_streak", models.PositiveIntegerField(default=0)),
+                ("month", models.DateField(blank=True, null=True)),
+                ("month_visits", models.PositiveIntegerField(default=0)),
+                (
+                    "month_duration",
+                    models.FloatField(
+                        default=0, help_text="Duration this month in minutes"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "member stats",
+            },
+        ),
+    ]
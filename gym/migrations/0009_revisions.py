@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gym", "0008_member_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="gymoccupancy",
+            name="revision",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="member",
+            name="revision",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
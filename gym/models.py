@@ -1,11 +1,218 @@
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.db import models, transaction
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import (
     BaseUserManager, AbstractBaseUser, PermissionsMixin
 )
 from django.utils import timezone
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from .cache import forget_token_versions
+from .signals import member_status_changed
 
+# Sessions left open for longer than this are closed automatically
+SESSION_TIME_LIMIT = timedelta(hours=1, minutes=30)
 
-class MemberManager(BaseUserManager):
+# Fields copied into access token claims; narrowing one revokes issued tokens
+TOKEN_CLAIM_FIELDS = ("is_staff", "is_active", "subscription_start", "subscription_end")
+
+# Every write to a member row bumps its revision, which versions HTTP responses
+BUMP_REVISION = models.F("revision") + 1
+
+
+def notify_status_changed(member_ids, using=None, reason="update"):
+    """
+    Send member_status_changed once the current transaction commits. reason
+    names the change: enter, exit, auto_close, reset, door_events or update.
+    """
+    member_ids = list(member_ids)
+    if member_ids:
+        transaction.on_commit(
+            lambda: member_status_changed.send(sender=Member, member_ids=member_ids, reason=reason),
+            using=using
+        )
+
+
+def access_narrowed(stored, changes):
+    """
+    Check whether changing the TOKEN_CLAIM_FIELDS values in stored to those in
+    changes takes access away: staff or active status removed, a subscription
+    starting later, or ending earlier. Fields missing from changes are left
+    alone. Widened claims need no revocation, as MemberClaimsUser confirms
+    a subscription its token calls inactive against the database.
+    """
+    for flag in ("is_staff", "is_active"):
+        if flag in changes and stored[flag] and not changes[flag]:
+            return True
+    if "subscription_start" in changes and changes["subscription_start"] > stored["subscription_start"]:
+        return True
+    if "subscription_end" in changes:
+        old_end, end = stored["subscription_end"], changes["subscription_end"]
+        if end is not None and (old_end is None or end < old_end):
+            return True
+    return False
+
+
+def subscription_is_active(start_date, end_date, today=None):
+    """Check if a subscription with the given dates is active today"""
+    today = today or timezone.now().date()
+    
+    # Convert subscription_start to date if it's a datetime
+    if hasattr(start_date, 'date'):
+        start_date = start_date.date()
+    
+    # Check if subscription_end exists and is in the future
+    if end_date:
+        if hasattr(end_date, 'date'):
+            end_date = end_date.date()
+        return start_date <= today <= end_date
+    
+    # If no end date is set, check if subscription has started
+    return start_date <= today
+
+
+def hour_buckets(entry_time, exit_time):
+    """Yield (hour_start, minutes) for every local clock hour a session overlaps"""
+    hour = timezone.localtime(entry_time).replace(minute=0, second=0, microsecond=0)
+    while hour < exit_time:
+        next_hour = timezone.localtime(hour.astimezone(dt_timezone.utc) + timedelta(hours=1))
+        overlap = min(exit_time, next_hour) - max(entry_time, hour)
+        yield hour, overlap.total_seconds() / 60
+        hour = next_hour
+
+
+def rollup_deltas(sessions):
+    """
+    Compute what a batch of sessions adds to the attendance rollups.
+    sessions yields (member_id, entry_time, exit_time, duration) tuples.
+    Returns (daily, hourly) dicts of counter increments keyed like
+    DailyMemberStats and HourlyOccupancy rows.
+    """
+    daily = {}
+    hourly = {}
+    for member_id, entry_time, exit_time, duration in sessions:
+        key = (member_id, timezone.localdate(entry_time))
+        visits, total = daily.get(key, (0, 0))
+        daily[key] = (visits + 1, total + duration)
+
+        for index, (hour, minutes) in enumerate(hour_buckets(entry_time, exit_time)):
+            visits, total, occupied = hourly.get((hour,), (0, 0, 0))
+            if index == 0:
+                # Visits and durations are counted in the hour the session started
+                visits, total = visits + 1, total + duration
+            hourly[(hour,)] = (visits, total, occupied + minutes)
+    return daily, hourly
+
+
+def active_subscription_q(today=None):
+    """SQL equivalent of Member.has_active_subscription"""
+    today = today or timezone.now().date()
+    return models.Q(subscription_start__lte=today) & (
+        models.Q(subscription_end__isnull=True) | models.Q(subscription_end__gte=today)
+    )
+
+
+def expired_subscription_q(today=None):
+    """SQL equivalent of not Member.has_active_subscription"""
+    today = today or timezone.now().date()
+    return models.Q(subscription_start__gt=today) | models.Q(subscription_end__lt=today)
+
+
+class MemberQuerySet(models.QuerySet):
+    """
+    Queryset for Member with gym status helpers.
+    A session open for longer than SESSION_TIME_LIMIT counts as already closed,
+    even before close_long_sessions has written it to the database.
+    """
+    def active(self, today=None):
+        """Members whose subscription is active today"""
+        return self.filter(active_subscription_q(today))
+
+    def expired(self, today=None):
+        """Members whose subscription is not active today"""
+        return self.filter(expired_subscription_q(today))
+
+    def with_subscription_status(self, today=None):
+        """Annotate subscription_is_active so it can be sorted and aggregated in SQL"""
+        return self.annotate(subscription_is_active=models.ExpressionWrapper(
+            active_subscription_q(today), output_field=models.BooleanField()
+        ))
+
+    def refresh_subscription_status(self, today=None, dry_run=False):
+        """
+        Recompute the stored subscription_active column with two UPDATE
+        statements that only touch members whose status changed.
+        With dry_run the changes are counted but not written.
+        Returns (activated_count, expired_count).
+        """
+        to_activate = self.active(today).filter(subscription_active=False)
+        to_expire = self.expired(today).filter(subscription_active=True)
+        if dry_run:
+            return to_activate.count(), to_expire.count()
+        with transaction.atomic(using=self.db):
+            activated = to_activate.update(subscription_active=True, revision=BUMP_REVISION)
+            expired = to_expire.update(subscription_active=False, revision=BUMP_REVISION)
+        return activated, expired
+
+    def in_gym(self, now=None):
+        """Members currently in the gym, excluding overdue sessions"""
+        cutoff_time = (now or timezone.now()) - SESSION_TIME_LIMIT
+        return self.filter(is_in_gym=True).filter(
+            models.Q(entry_time__isnull=True) | models.Q(entry_time__gte=cutoff_time)
+        )
+
+    def overdue(self, now=None):
+        """Members whose open session has passed SESSION_TIME_LIMIT"""
+        cutoff_time = (now or timezone.now()) - SESSION_TIME_LIMIT
+        return self.filter(is_in_gym=True, entry_time__lt=cutoff_time)
+
+    def pending_sessions(self, now=None):
+        """
+        Build unsaved GymSession objects for overdue sessions that have not been
+        closed yet. They match the rows close_long_sessions will write later.
+        """
+        members = self.overdue(now).only("id", "name", "entry_time")
+        return [GymSession.auto_closed(member.entry_time, member=member) for member in members]
+
+    def close_long_sessions(self, now=None):
+        """
+        Close every session that has been open for longer than SESSION_TIME_LIMIT.
+        Returns the number of sessions closed.
+        """
+        closed_count, _ = self.overdue(now).close_open_sessions(
+            lambda entry_time: entry_time + SESSION_TIME_LIMIT, reason="auto_close"
+        )
+        return closed_count
+
+    def close_open_sessions(self, exit_time_for, reason="reset"):
+        """
+        Close the open sessions of the members in this queryset. All sessions are
+        inserted with one bulk_create and the members are cleared with a single
+        conditional UPDATE inside one transaction. exit_time_for(entry_time)
+        returns the exit time recorded for each session, and reason is passed
+        on to member_status_changed.
+        The queryset must not match sessions that can start during the call, e.g.
+        filter on entry_time being before a fixed moment.
+        Returns (members_cleared, sessions_recorded).
+        """
+        with transaction.atomic(using=self.db):
+            open_sessions = self.select_for_update().filter(is_in_gym=True)
+            rows = list(open_sessions.values_list("pk", "entry_time"))
+            if not rows:
+                return 0, 0
+
+            sessions = GymSession.objects.using(self.db).record([
+                GymSession.closed(entry_time, exit_time_for(entry_time), member_id=pk)
+                for pk, entry_time in rows
+                if entry_time is not None
+            ])
+            cleared_count = open_sessions.update(is_in_gym=False, entry_time=None, revision=BUMP_REVISION)
+            GymOccupancy.objects.adjust(-cleared_count)
+            notify_status_changed([pk for pk, _ in rows], using=self.db, reason=reason)
+
+        return cleared_count, len(sessions)
+
+
+class MemberManager(BaseUserManager.from_queryset(MemberQuerySet)):
     """
     Custom manager for Member model that handles user creation
     """
@@ -31,6 +238,156 @@ class MemberManager(BaseUserManager):
 
         return self.create_user(phone_number, name, password, **extra_fields)
 
+    def enter(self, pk, now=None):
+        """
+        Record a member's entry with a single conditional UPDATE, so concurrent
+        scans cannot enter the same member twice. Only is_in_gym and entry_time
+        are written. Returns a (success, message) tuple.
+        """
+        now = now or timezone.now()
+        member = self.filter(pk=pk)
+
+        with transaction.atomic(using=self.db):
+            entered = member.filter(is_in_gym=False).update(is_in_gym=True, entry_time=now, revision=BUMP_REVISION)
+            if not entered and member.close_long_sessions(now=now):
+                # The previous session was overdue and has just been closed
+                entered = member.filter(is_in_gym=False).update(is_in_gym=True, entry_time=now, revision=BUMP_REVISION)
+            GymOccupancy.objects.adjust(entered)
+            if entered:
+                notify_status_changed([pk], using=self.db, reason="enter")
+
+        if not entered:
+            return False, "Already in the gym"
+        return True, "Successfully entered the gym"
+
+    def exit(self, pk, now=None):
+        """
+        Record a member's exit and its session in one transaction. The status is
+        cleared with a conditional UPDATE on the entry time that was read, so
+        only one of several concurrent scans records a session.
+        Returns a (success, message) tuple.
+        """
+        now = now or timezone.now()
+
+        with transaction.atomic(using=self.db):
+            open_session = self.select_for_update().filter(pk=pk, is_in_gym=True)
+            entry_times = list(open_session.values_list("entry_time", flat=True))
+            if not entry_times:
+                return False, "Not currently in the gym"
+
+            entry_time = entry_times[0]
+            if not open_session.filter(entry_time=entry_time).update(
+                is_in_gym=False, entry_time=None, revision=BUMP_REVISION
+            ):
+                return False, "Not currently in the gym"
+            GymOccupancy.objects.adjust(-1)
+            if entry_time is None:
+                notify_status_changed([pk], using=self.db, reason="reset")
+                return True, "Gym status reset"
+
+            if entry_time < now - SESSION_TIME_LIMIT:
+                # The session had already been auto-closed, record it as such
+                GymSession.objects.using(self.db).record([GymSession.auto_closed(entry_time, member_id=pk)])
+                notify_status_changed([pk], using=self.db, reason="auto_close")
+                return False, "Not currently in the gym"
+
+            GymSession.objects.using(self.db).record([GymSession.closed(entry_time, now, member_id=pk)])
+            notify_status_changed([pk], using=self.db, reason="exit")
+
+        return True, "Successfully exited the gym and session recorded"
+
+    async def aenter(self, pk, now=None):
+        """
+        Async enter() for async views. Django cannot open transactions in async
+        code, so the whole transaction runs in one thread hop instead of one
+        hop per query.
+        """
+        return await sync_to_async(self.enter)(pk, now)
+
+    async def aexit(self, pk, now=None):
+        """Async exit() for async views, run in one thread hop like aenter()"""
+        return await sync_to_async(self.exit)(pk, now)
+
+    def apply_door_events(self, events):
+        """
+        Apply an ordered batch of turnstile events in one transaction.
+        Each event is a dict with member_id, direction ("enter" or "exit") and
+        timestamp; the timestamp is used instead of the current time so replayed
+        scans get correct durations. Sessions are bulk created and every touched
+        member is written once with bulk_update.
+        Returns a (success, message) tuple per event.
+        """
+        member_ids = {event["member_id"] for event in events}
+        occupancy_change = 0
+        results = []
+        sessions = []
+        changed = set()
+
+        with transaction.atomic(using=self.db):
+            status_by_member = {
+                pk: [is_in_gym, entry_time]
+                for pk, is_in_gym, entry_time in self.select_for_update()
+                .filter(pk__in=member_ids)
+                .values_list("pk", "is_in_gym", "entry_time")
+            }
+
+            for event in events:
+                pk, timestamp = event["member_id"], event["timestamp"]
+                if pk not in status_by_member:
+                    results.append((False, "Member not found"))
+                    continue
+
+                current = status_by_member[pk]
+                is_in_gym, entry_time = current
+                if is_in_gym and entry_time and entry_time < timestamp - SESSION_TIME_LIMIT:
+                    # The open session was already overdue when this scan happened
+                    sessions.append(GymSession.auto_closed(entry_time, member_id=pk))
+                    is_in_gym, entry_time = False, None
+                    current[:] = is_in_gym, entry_time
+                    occupancy_change -= 1
+                    changed.add(pk)
+
+                if event["direction"] == "enter":
+                    if is_in_gym:
+                        results.append((False, "Already in the gym"))
+                        continue
+                    current[:] = True, timestamp
+                    occupancy_change += 1
+                    results.append((True, "Successfully entered the gym"))
+                else:
+                    if not is_in_gym:
+                        results.append((False, "Not currently in the gym"))
+                        continue
+                    if entry_time and timestamp < entry_time:
+                        results.append((False, "Exit is earlier than the recorded entry"))
+                        continue
+                    if entry_time:
+                        sessions.append(GymSession.closed(entry_time, timestamp, member_id=pk))
+                        results.append((True, "Successfully exited the gym and session recorded"))
+                    else:
+                        results.append((True, "Gym status reset"))
+                    current[:] = False, None
+                    occupancy_change -= 1
+                changed.add(pk)
+
+            GymSession.objects.using(self.db).record(sessions)
+            self.bulk_update(
+                [
+                    self.model(
+                        pk=pk,
+                        is_in_gym=status_by_member[pk][0],
+                        entry_time=status_by_member[pk][1],
+                        revision=BUMP_REVISION,
+                    )
+                    for pk in changed
+                ],
+                ["is_in_gym", "entry_time", "revision"],
+            )
+            GymOccupancy.objects.adjust(occupancy_change)
+            notify_status_changed(changed, using=self.db, reason="door_events")
+
+        return results
+
 
 class Member(AbstractBaseUser, PermissionsMixin):
     """
@@ -40,6 +397,12 @@ class Member(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=100)
     subscription_start = models.DateField(default=timezone.now) 
     subscription_end = models.DateField(null=True, blank=True)
+    # Stored copy of has_active_subscription, refreshed on save and nightly
+    subscription_active = models.BooleanField(default=True, db_index=True)
+    # Bumped to revoke every token issued so far
+    token_version = models.PositiveIntegerField(default=0)
+    # Bumped on every write, used as the ETag of the member's read endpoints
+    revision = models.PositiveIntegerField(default=0, editable=False)
     is_in_gym = models.BooleanField(default=False)
     entry_time = models.DateTimeField(null=True, blank=True)
     date_joined = models.DateTimeField(default=timezone.now)
@@ -50,66 +413,119 @@ class Member(AbstractBaseUser, PermissionsMixin):
     
     USERNAME_FIELD = 'phone_number'
     REQUIRED_FIELDS = ['name']
+
+    class Meta:
+        indexes = [
+            # Serves in_gym(), overdue() and the occupancy reconcile count
+            models.Index(
+                fields=['entry_time'],
+                condition=models.Q(is_in_gym=True),
+                name='gym_member_in_gym_entry_idx',
+            ),
+            models.Index(fields=['subscription_end'], name='gym_member_sub_end_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.phone_number})"
 
+    def save(self, *args, **kwargs):
+        """
+        Keep the stored subscription_active column in step with the dates and
+        bump the revision. The revision is incremented in SQL, so a stale
+        instance can never write back a revision that was already used, and
+        is read back afterwards.
+        Narrowing a field in TOKEN_CLAIM_FIELDS also bumps token_version, so
+        tokens carrying the old staff flag or subscription are rejected.
+        """
+        self.subscription_active = self.has_active_subscription
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"subscription_start", "subscription_end"} & set(update_fields):
+            kwargs["update_fields"] = update_fields = {*update_fields, "subscription_active"}
+        adding = self._state.adding
+        revoke = not adding and self.token_access_narrowed(update_fields)
+        if not adding:
+            self.revision = BUMP_REVISION
+            if revoke:
+                self.token_version = models.F("token_version") + 1
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "revision", *(["token_version"] if revoke else [])}
+        super().save(*args, **kwargs)
+        if not adding:
+            # Load the incremented values in place of the F() expressions
+            self.refresh_from_db(fields=["revision", *(["token_version"] if revoke else [])])
+        if revoke:
+            transaction.on_commit(lambda: forget_token_versions(self.pk), using=self._state.db)
+        if not adding and self.is_in_gym:
+            # The member is part of the in-gym list, whose version is the occupancy revision
+            GymOccupancy.objects.touch()
+
+    def token_access_narrowed(self, update_fields=None):
+        """Check whether the unsaved TOKEN_CLAIM_FIELDS narrow the stored row's access"""
+        fields = [name for name in TOKEN_CLAIM_FIELDS if update_fields is None or name in update_fields]
+        if not fields or self.pk is None:
+            return False
+        stored = type(self)._base_manager.filter(pk=self.pk).values(*fields).first()
+        if stored is None:
+            return False
+        return access_narrowed(stored, {
+            name: self._meta.get_field(name).to_python(getattr(self, name)) for name in fields
+        })
+
     @property
     def has_active_subscription(self):
         """Check if member has an active subscription"""
-        today = timezone.now().date()
-        
-        # Convert subscription_start to date if it's a datetime
-        start_date = self.subscription_start
-        if hasattr(start_date, 'date'):
-            start_date = start_date.date()
-        
-        # Check if subscription_end exists and is in the future
-        if self.subscription_end:
-            end_date = self.subscription_end
-            if hasattr(end_date, 'date'):
-                end_date = end_date.date()
-            return start_date <= today <= end_date
-        
-        # If no end date is set, check if subscription has started
-        return start_date <= today
-    
+        return subscription_is_active(self.subscription_start, self.subscription_end)
+
+    @property
+    def is_session_overdue(self):
+        """Check if the member's open session has passed SESSION_TIME_LIMIT"""
+        if not self.is_in_gym or not self.entry_time:
+            return False
+        return self.entry_time < timezone.now() - SESSION_TIME_LIMIT
+
     def enter_gym(self):
         """Record member entry to the gym"""
-        if self.is_in_gym:
-            return False, "Already in the gym"
-            
-        self.is_in_gym = True
-        self.entry_time = timezone.now()
-        self.save()
-        return True, "Successfully entered the gym"
+        entry_time = timezone.now()
+        success, message = Member.objects.enter(self.pk, now=entry_time)
+        if success:
+            self.is_in_gym = True
+            self.entry_time = entry_time
+        return success, message
 
     def exit_gym(self):
         """Record member exit from the gym and create a session record"""
-        if not self.is_in_gym:
-            return False, "Not currently in the gym"
-            
-        if not self.entry_time:
-            self.is_in_gym = False
-            self.save()
-            return True, "Gym status reset"
-            
-        exit_time = timezone.now()
-        duration = exit_time - self.entry_time
-
-        # Create a new gym session
-        GymSession.objects.create(
-            member=self,
-            entry_time=self.entry_time,
-            exit_time=exit_time,
-            duration=duration.total_seconds() / 60,  # Duration in minutes
-        )
-
-        # Update member status
+        success, message = Member.objects.exit(self.pk)
         self.is_in_gym = False
         self.entry_time = None
-        self.save()
-        return True, "Successfully exited the gym and session recorded"
+        return success, message
+
+
+class GymSessionQuerySet(models.QuerySet):
+    """
+    Queryset for GymSession
+    """
+    def with_member_name(self):
+        """Fetch the member name shown by GymSessionSerializer in the same query"""
+        return self.select_related("member").only(
+            "id", "member_id", "entry_time", "exit_time", "duration", "member__name"
+        )
+
+    def record(self, sessions):
+        """
+        Insert closed sessions with one bulk_create and add them to the
+        DailyMemberStats, HourlyOccupancy and MemberStats rollups in the same
+        transaction. Every code path that closes sessions goes through here.
+        """
+        with transaction.atomic(using=self.db, savepoint=False):
+            sessions = self.bulk_create(sessions)
+            daily, hourly = rollup_deltas(
+                (session.member_id, session.entry_time, session.exit_time, session.duration)
+                for session in sessions
+            )
+            DailyMemberStats.objects.using(self.db).increment(daily)
+            HourlyOccupancy.objects.using(self.db).increment(hourly)
+            MemberStats.objects.using(self.db).add_days(daily)
+        return sessions
 
 
 class GymSession(models.Model):
@@ -120,9 +536,409 @@ class GymSession(models.Model):
     entry_time = models.DateTimeField()
     exit_time = models.DateTimeField()
     duration = models.FloatField(help_text="Duration in minutes")
+
+    objects = GymSessionQuerySet.as_manager()
     
     class Meta:
         ordering = ['-entry_time']  # Most recent sessions first
+        indexes = [
+            # Recent sessions of one member
+            models.Index(fields=['member', '-entry_time'], name='gym_session_member_entry_idx'),
+            # Cursor pagination over all sessions
+            models.Index(fields=['-entry_time', '-id'], name='gym_session_entry_id_idx'),
+        ]
+
+    @classmethod
+    def closed(cls, entry_time, exit_time, **member):
+        """
+        Build a session between entry_time and exit_time.
+        Pass the owner as either member=<Member> or member_id=<pk>.
+        """
+        return cls(
+            entry_time=entry_time,
+            exit_time=exit_time,
+            duration=(exit_time - entry_time).total_seconds() / 60,  # Duration in minutes
+            **member,
+        )
+
+    @classmethod
+    def auto_closed(cls, entry_time, **member):
+        """Build the session recorded when an open session hits SESSION_TIME_LIMIT"""
+        return cls.closed(entry_time, entry_time + SESSION_TIME_LIMIT, **member)
     
     def __str__(self):
         return f"{self.member.name} - {self.entry_time.strftime('%Y-%m-%d %H:%M')}"
+
+
+class GymOccupancyManager(models.Manager):
+    """
+    Manager for the single GymOccupancy row
+    """
+    ROW_ID = 1
+
+    def adjust(self, delta):
+        """Atomically add delta to the live count, creating the row if needed"""
+        if not delta:
+            return
+        updated = self.filter(pk=self.ROW_ID).update(
+            count=models.F("count") + delta,
+            revision=models.F("revision") + 1,
+            updated_at=timezone.now()
+        )
+        if not updated:
+            self.reconcile()
+
+    def touch(self):
+        """Bump the revision when an in-gym member changes without the count changing"""
+        if not self.filter(pk=self.ROW_ID).update(revision=models.F("revision") + 1):
+            self.reconcile()
+
+    def current(self, now=None):
+        """
+        Return the live count with a primary key lookup. Overdue sessions count
+        as closed before the sweeper writes them, as they do in in_gym(), so
+        they are subtracted using the partial in-gym entry_time index.
+        """
+        count = self.filter(pk=self.ROW_ID).values_list("count", flat=True).first()
+        if count is None:
+            count = self.reconcile()
+        return count - Member.objects.overdue(now).count()
+
+    def revision(self):
+        """Return the revision of the in-gym list with a single primary key lookup"""
+        revision = self.filter(pk=self.ROW_ID).values_list("revision", flat=True).first()
+        if revision is None:
+            self.reconcile()
+            revision = self.filter(pk=self.ROW_ID).values_list("revision", flat=True).get()
+        return revision
+
+    async def arevision(self):
+        """Async revision() for async views"""
+        revision = await self.filter(pk=self.ROW_ID).values_list("revision", flat=True).afirst()
+        if revision is None:
+            revision = await sync_to_async(self.revision)()
+        return revision
+
+    def reconcile(self):
+        """
+        Recompute the count from the members table and store it. The revision
+        only changes when the stored count was wrong.
+        """
+        count = Member.objects.filter(is_in_gym=True).count()
+        now = timezone.now()
+        fixed = self.filter(pk=self.ROW_ID).exclude(count=count).update(
+            count=count, revision=models.F("revision") + 1, updated_at=now
+        )
+        if not fixed:
+            self.get_or_create(pk=self.ROW_ID, defaults={"count": count, "updated_at": now})
+        return count
+
+
+class GymOccupancy(models.Model):
+    """
+    Single-row counter of members whose is_in_gym flag is set.
+    Enter, exit and auto-close adjust it in the same transaction as the member
+    update, and the sweeper reconciles it against the members table.
+    """
+    count = models.IntegerField(default=0)
+    # Bumped whenever the set of members in the gym may have changed
+    revision = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    objects = GymOccupancyManager()
+
+    class Meta:
+        verbose_name_plural = "gym occupancy"
+
+    def __str__(self):
+        return f"{self.count} members in the gym"
+
+
+def update_or_insert(queryset, lookup, changes):
+    """
+    Apply changes, a dict of UPDATE expressions, to the row matching lookup.
+    A missing row is inserted with its defaults first; ignore_conflicts lets
+    a concurrent insert of the same row win, and the UPDATE then applies.
+    Takes one statement when the row exists.
+    """
+    if queryset.filter(**lookup).update(**changes):
+        return
+    queryset.bulk_create([queryset.model(**lookup)], ignore_conflicts=True)
+    queryset.filter(**lookup).update(**changes)
+
+
+class RollupQuerySet(models.QuerySet):
+    """
+    Queryset for rollup tables. Each model lists the fields identifying a row
+    in KEY_FIELDS and its counters in COUNTER_FIELDS.
+    """
+    # Up to this many rows, as touched by one session, are incremented in place
+    IN_PLACE_ROWS = 3
+
+    def increment(self, deltas):
+        """
+        Add deltas, a dict mapping KEY_FIELDS tuples to COUNTER_FIELDS tuples,
+        to the matching rows. A few rows are incremented with one F() UPDATE
+        each. Larger batches create missing rows first, then lock all touched
+        rows, update them in memory and write them with one bulk_update.
+        """
+        if not deltas:
+            return
+        key_fields, counter_fields = self.model.KEY_FIELDS, self.model.COUNTER_FIELDS
+
+        if len(deltas) <= self.IN_PLACE_ROWS:
+            for key, amounts in deltas.items():
+                update_or_insert(self, dict(zip(key_fields, key)), {
+                    field: models.F(field) + amount for field, amount in zip(counter_fields, amounts)
+                })
+            return
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            self.bulk_create(
+                [self.model(**dict(zip(key_fields, key))) for key in deltas],
+                ignore_conflicts=True,
+            )
+            rows = self.select_for_update().filter(**{
+                f"{field}__in": {key[index] for key in deltas}
+                for index, field in enumerate(key_fields)
+            })
+            changed = []
+            for row in rows:
+                amounts = deltas.get(tuple(getattr(row, field) for field in key_fields))
+                if amounts is None:
+                    continue
+                for field, amount in zip(counter_fields, amounts):
+                    setattr(row, field, getattr(row, field) + amount)
+                changed.append(row)
+            self.bulk_update(changed, counter_fields)
+
+
+class DailyMemberStats(models.Model):
+    """
+    Visits and total session minutes of one member on one local calendar day,
+    maintained as sessions are recorded
+    """
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    visits = models.PositiveIntegerField(default=0)
+    total_duration = models.FloatField(default=0, help_text="Total duration in minutes")
+
+    objects = RollupQuerySet.as_manager()
+
+    KEY_FIELDS = ("member_id", "date")
+    COUNTER_FIELDS = ("visits", "total_duration")
+
+    class Meta:
+        verbose_name_plural = "daily member stats"
+        constraints = [
+            models.UniqueConstraint(fields=['member', 'date'], name='gym_daily_member_stats_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.member_id} on {self.date}: {self.visits} visits"
+
+    @property
+    def average_duration(self):
+        """Average session length in minutes"""
+        return self.total_duration / self.visits if self.visits else 0
+
+
+class HourlyOccupancyQuerySet(RollupQuerySet):
+    """
+    Queryset for HourlyOccupancy with dashboard helpers
+    """
+    def between_days(self, first_day, last_day):
+        """Hours of the local calendar days first_day to last_day, inclusive"""
+        start = timezone.make_aware(datetime.combine(first_day, time.min))
+        end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+        return self.filter(hour__gte=start, hour__lt=end)
+
+    def daily_totals(self, first_day, last_day):
+        """
+        Fold the hours of each day into one dict with visits, total_duration,
+        average_duration and the peak hour by average occupancy. Reads at most
+        24 rows per day, however many sessions the days had.
+        """
+        days = {}
+        for row in self.between_days(first_day, last_day).order_by("hour"):
+            day = days.setdefault(timezone.localdate(row.hour), {
+                "visits": 0, "total_duration": 0, "peak_hour": None, "peak_occupancy": 0,
+            })
+            day["visits"] += row.visits
+            day["total_duration"] += row.total_duration
+            if row.average_occupancy > day["peak_occupancy"]:
+                day["peak_hour"] = timezone.localtime(row.hour)
+                day["peak_occupancy"] = row.average_occupancy
+        return [
+            {
+                "date": day,
+                **totals,
+                "average_duration": totals["total_duration"] / totals["visits"] if totals["visits"] else 0,
+            }
+            for day, totals in sorted(days.items())
+        ]
+
+
+class HourlyOccupancy(models.Model):
+    """
+    Attendance in one local clock hour, maintained as sessions are recorded.
+    Visits and total_duration count sessions that started in the hour;
+    occupied_minutes adds up the minutes members spent in the gym during it.
+    """
+    hour = models.DateTimeField(unique=True)
+    visits = models.PositiveIntegerField(default=0)
+    total_duration = models.FloatField(default=0, help_text="Total duration in minutes")
+    occupied_minutes = models.FloatField(default=0)
+
+    objects = HourlyOccupancyQuerySet.as_manager()
+
+    KEY_FIELDS = ("hour",)
+    COUNTER_FIELDS = ("visits", "total_duration", "occupied_minutes")
+
+    class Meta:
+        ordering = ['hour']
+        verbose_name_plural = "hourly occupancy"
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H:00}: {self.visits} visits"
+
+    @property
+    def average_occupancy(self):
+        """Average number of members in the gym during the hour"""
+        return self.occupied_minutes / 60
+
+
+class MemberStatsQuerySet(models.QuerySet):
+    """
+    Queryset for MemberStats
+    """
+    def add_days(self, daily):
+        """
+        Apply per-day visit totals, a dict mapping (member_id, date) to
+        (visits, total_duration) as built by rollup_deltas, to the members'
+        stats rows. A single day, as added by one session, is applied with
+        one UPDATE. Otherwise rows are created if missing, locked, updated in
+        date order and written with one bulk_update.
+        """
+        if not daily:
+            return
+        if len(daily) == 1:
+            [((member_id, day), (visits, duration))] = daily.items()
+            update_or_insert(self, {"member_id": member_id}, MemberStats.day_changes(day, visits, duration))
+            return
+        member_ids = {member_id for member_id, _ in daily}
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            self.bulk_create(
+                [self.model(member_id=member_id) for member_id in member_ids],
+                ignore_conflicts=True,
+            )
+            rows = {row.member_id: row for row in self.select_for_update().filter(member_id__in=member_ids)}
+            for (member_id, day), (visits, duration) in sorted(daily.items()):
+                rows[member_id].add_day(day, visits, duration)
+            self.bulk_update(rows.values(), MemberStats.COUNTER_FIELDS)
+
+
+class MemberStats(models.Model):
+    """
+    Lifetime attendance counters of one member, updated as sessions are
+    recorded so the profile summary is a single row read
+    """
+    member = models.OneToOneField(Member, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    total_visits = models.PositiveIntegerField(default=0)
+    total_duration = models.FloatField(default=0, help_text="Total duration in minutes")
+    last_visit_date = models.DateField(null=True, blank=True)
+    # Consecutive days with a visit, ending at last_visit_date
+    current_streak = models.PositiveIntegerField(default=0)
+    longest_streak = models.PositiveIntegerField(default=0)
+    # First day of the month that month_visits and month_duration cover
+    month = models.DateField(null=True, blank=True)
+    month_visits = models.PositiveIntegerField(default=0)
+    month_duration = models.FloatField(default=0, help_text="Duration this month in minutes")
+
+    objects = MemberStatsQuerySet.as_manager()
+
+    COUNTER_FIELDS = (
+        "total_visits", "total_duration", "last_visit_date", "current_streak",
+        "longest_streak", "month", "month_visits", "month_duration",
+    )
+
+    class Meta:
+        verbose_name_plural = "member stats"
+
+    def __str__(self):
+        return f"{self.member_id}: {self.total_visits} visits"
+
+    def add_day(self, day, visits, duration):
+        """
+        Count visits on a local calendar day. Days must arrive in date order;
+        an earlier day (e.g. a replayed scan) updates the totals but not the
+        streak, which rebuild_rollups recomputes.
+        """
+        self.total_visits += visits
+        self.total_duration += duration
+
+        if self.last_visit_date is None or day > self.last_visit_date:
+            consecutive = self.last_visit_date is not None and day == self.last_visit_date + timedelta(days=1)
+            self.current_streak = self.current_streak + 1 if consecutive else 1
+            self.longest_streak = max(self.longest_streak, self.current_streak)
+            self.last_visit_date = day
+
+        month = day.replace(day=1)
+        if self.month is None or month > self.month:
+            self.month, self.month_visits, self.month_duration = month, visits, duration
+        elif month == self.month:
+            self.month_visits += visits
+            self.month_duration += duration
+
+    @staticmethod
+    def day_changes(day, visits, duration):
+        """
+        add_day() as UPDATE expressions, so one day is added without reading
+        the row. Every expression sees the row as it was before the UPDATE.
+        """
+        F, Value = models.F, models.Value
+        streak = models.Case(
+            models.When(last_visit_date__gte=day, then=F("current_streak")),
+            models.When(last_visit_date=day - timedelta(days=1), then=F("current_streak") + 1),
+            default=Value(1),
+            output_field=models.PositiveIntegerField(),
+        )
+        month = day.replace(day=1)
+        return {
+            "total_visits": F("total_visits") + visits,
+            "total_duration": F("total_duration") + duration,
+            "current_streak": streak,
+            "longest_streak": Greatest(F("longest_streak"), streak),
+            "last_visit_date": models.Case(
+                models.When(last_visit_date__gte=day, then=F("last_visit_date")),
+                default=Value(day),
+            ),
+            "month": models.Case(models.When(month__gt=month, then=F("month")), default=Value(month)),
+            "month_visits": models.Case(
+                models.When(month=month, then=F("month_visits") + visits),
+                models.When(month__gt=month, then=F("month_visits")),
+                default=Value(visits),
+                output_field=models.PositiveIntegerField(),
+            ),
+            "month_duration": models.Case(
+                models.When(month=month, then=F("month_duration") + duration),
+                models.When(month__gt=month, then=F("month_duration")),
+                default=Value(duration),
+                output_field=models.FloatField(),
+            ),
+        }
+
+    def streak(self, today=None):
+        """Current streak, which is broken once a whole day passes without a visit"""
+        today = today or timezone.localdate()
+        if self.last_visit_date is None or self.last_visit_date < today - timedelta(days=1):
+            return 0
+        return self.current_streak
+
+    def this_month(self, today=None):
+        """Return (visits, average session length in minutes) for the current month"""
+        today = today or timezone.localdate()
+        if self.month != today.replace(day=1) or not self.month_visits:
+            return 0, 0
+        return self.month_visits, self.month_duration / self.month_visits
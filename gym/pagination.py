@@ -0,0 +1,105 @@
+"""
+Pagination classes for the gym API
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def session_sort_key(session):
+    """
+    Sort key matching the (-entry_time, -id) order of the session list.
+    Unsaved auto-closed sessions have no id yet, so they use -member_id,
+    which keeps the key unique and below every real id.
+    """
+    return session.entry_time, session.pk if session.pk is not None else -session.member_id
+
+
+class SessionCursorPagination(BasePagination):
+    """
+    Keyset pagination for gym sessions on (entry_time, id), most recent first.
+    Each page seeks past the last key of the previous one, so deep pages cost
+    the same as the first page instead of growing like OFFSET.
+    """
+    page_size = 100
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None, pending=()):
+        """
+        Return one page of sessions. `pending` holds unsaved sessions that are
+        merged into the page by the same key as the persisted rows.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by("-entry_time", "-id")
+        if position is not None:
+            entry_time, key = position
+            queryset = queryset.filter(
+                Q(entry_time__lt=entry_time) | Q(entry_time=entry_time, id__lt=key)
+            )
+            pending = [session for session in pending if session_sort_key(session) < position]
+
+        rows = sorted(
+            [*queryset[:page_size + 1], *pending],
+            key=session_sort_key,
+            reverse=True
+        )
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            entry_time, key = urlsafe_b64decode(encoded.encode("ascii")).decode("ascii").split("|")
+            entry_time = parse_datetime(entry_time)
+            key = int(key)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if entry_time is None:
+            raise NotFound(self.invalid_cursor_message)
+        return entry_time, key
+
+    def encode_cursor(self, session):
+        entry_time, key = session_sort_key(session)
+        token = urlsafe_b64encode(f"{entry_time.isoformat()}|{key}".encode("ascii")).decode("ascii")
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -1,7 +1,11 @@
 from rest_framework import serializers
-from .models import Member, GymSession
-from rest_framework_simplejwt.tokens import RefreshToken
+from .models import Member, GymSession, DailyMemberStats, HourlyOccupancy, MemberStats
 from django.utils import timezone
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .authentication import MemberRefreshToken, add_member_claims
+from .hashers import acheck_member_password, check_member_password
 
 
 class MemberSerializer(serializers.ModelSerializer):
@@ -11,6 +15,7 @@ class MemberSerializer(serializers.ModelSerializer):
     """
     password = serializers.CharField(write_only=True, required=True)
     has_active_subscription = serializers.BooleanField(read_only=True)
+    is_in_gym = serializers.SerializerMethodField()
 
     class Meta:
         model = Member
@@ -27,6 +32,10 @@ class MemberSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ("id", "date_joined", "is_in_gym")
 
+    def get_is_in_gym(self, obj):
+        """Overdue sessions count as closed even before they are written"""
+        return obj.is_in_gym and not obj.is_session_overdue
+
     def create(self, validated_data):
         """Create a new member with proper subscription dates"""
         # Ensure subscription_start is set to today if not provided
@@ -62,19 +71,29 @@ class LoginSerializer(serializers.Serializer):
 
     def validate(self, data):
         """Validate credentials and generate tokens"""
-        phone_number = data.get("phone_number")
-        password = data.get("password")
-
-        # Check if member exists
-        try:
-            member = Member.objects.get(phone_number=phone_number)
-        except Member.DoesNotExist:
+        member = Member.objects.filter(phone_number=data.get("phone_number")).first()
+        # Check if password is correct, rehashing it if the hasher changed
+        password_ok = member is not None and check_member_password(member, data.get("password"))
+        return self.login(member, password_ok)
+
+    async def avalidate(self, data):
+        """
+        Async validate() for the async login view, which calls it with the
+        output of to_internal_value(). Passwords are hashed without blocking
+        the event loop.
+        """
+        member = await Member.objects.filter(phone_number=data.get("phone_number")).afirst()
+        password_ok = member is not None and await acheck_member_password(member, data.get("password"))
+        return self.login(member, password_ok)
+
+    @staticmethod
+    def login(member, password_ok):
+        """Reject unknown members, wrong passwords and expired subscriptions, or generate tokens"""
+        if member is None:
             raise serializers.ValidationError(
                 {"error": "No account found with this phone number"}
             )
-
-        # Check if password is correct
-        if not member.check_password(password):
+        if not password_ok:
             raise serializers.ValidationError(
                 {"error": "Incorrect password"}
             )
@@ -85,8 +104,8 @@ class LoginSerializer(serializers.Serializer):
                 {"error": "Your subscription has expired. Please renew to continue."}
             )
 
-        # Generate tokens
-        refresh = RefreshToken.for_user(member)
+        # Generate tokens carrying the claims used by StatelessJWTAuthentication
+        refresh = MemberRefreshToken.for_user(member)
 
         return {
             "member": member,
@@ -95,6 +114,31 @@ class LoginSerializer(serializers.Serializer):
         }
 
 
+class MemberTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh serializer that rebuilds the access token claims from the current
+    member row, so a renewed subscription or new staff flag reaches the
+    stateless endpoints without logging in again. Refresh tokens issued
+    before the member's tokens were revoked are rejected.
+    """
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        member = Member.objects.filter(pk=refresh.payload.get(api_settings.USER_ID_CLAIM)).first()
+        if member is None or not member.is_active:
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+        if refresh.get("ver", member.token_version) != member.token_version:
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+
+        add_member_claims(refresh, member)
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+        return data
+
+
 class GymSessionSerializer(serializers.ModelSerializer):
     """
     Serializer for gym session records
@@ -105,3 +149,101 @@ class GymSessionSerializer(serializers.ModelSerializer):
         model = GymSession
         fields = ("id", "member", "member_name", "entry_time", "exit_time", "duration")
         read_only_fields = ("id", "member_name", "duration")
+
+
+class MemberStatsSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a member's attendance summary
+    """
+    total_minutes = serializers.FloatField(source="total_duration")
+    current_streak = serializers.SerializerMethodField()
+    month_visits = serializers.SerializerMethodField()
+    month_average_duration = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MemberStats
+        fields = (
+            "member", "total_visits", "total_minutes", "last_visit_date", "current_streak",
+            "longest_streak", "month_visits", "month_average_duration"
+        )
+
+    def get_current_streak(self, obj):
+        return obj.streak()
+
+    def get_month_visits(self, obj):
+        return obj.this_month()[0]
+
+    def get_month_average_duration(self, obj):
+        return obj.this_month()[1]
+
+
+class DailyMemberStatsSerializer(serializers.ModelSerializer):
+    """
+    Serializer for one member's attendance on one day
+    """
+    average_duration = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = DailyMemberStats
+        fields = ("date", "visits", "total_duration", "average_duration")
+
+
+class DailyTotalsSerializer(serializers.Serializer):
+    """
+    Serializer for the gym-wide attendance of one day
+    """
+    date = serializers.DateField()
+    visits = serializers.IntegerField()
+    total_duration = serializers.FloatField()
+    average_duration = serializers.FloatField()
+    peak_hour = serializers.DateTimeField(allow_null=True)
+    peak_occupancy = serializers.FloatField()
+
+
+class HourlyOccupancySerializer(serializers.ModelSerializer):
+    """
+    Serializer for the attendance of one hour
+    """
+    average_occupancy = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = HourlyOccupancy
+        fields = ("hour", "visits", "total_duration", "occupied_minutes", "average_occupancy")
+
+
+class DoorEventSerializer(serializers.Serializer):
+    """
+    Serializer for a single buffered turnstile scan
+    """
+    member_id = serializers.IntegerField()
+    direction = serializers.ChoiceField(choices=("enter", "exit"))
+    timestamp = serializers.DateTimeField()
+
+
+class DoorEventBatchSerializer(serializers.Serializer):
+    """
+    Serializer for an ordered batch of turnstile scans
+    """
+    events = DoorEventSerializer(many=True, allow_empty=False, max_length=1000)
+
+
+class MemberImportSerializer(serializers.Serializer):
+    """
+    Serializer for one row of a bulk member import
+    Uniqueness of phone_number is checked per chunk by the importer
+    """
+    phone_number = serializers.CharField(max_length=15)
+    name = serializers.CharField(max_length=100)
+    password = serializers.CharField(write_only=True)
+    subscription_start = serializers.DateField(required=False)
+    subscription_end = serializers.DateField(required=False, allow_null=True)
+
+    def validate(self, data):
+        """Reject subscriptions that end before they start"""
+        start = data.get("subscription_start")
+        end = data.get("subscription_end")
+        if start and end and end < start:
+            raise serializers.ValidationError(
+                {"subscription_end": "Subscription cannot end before it starts."}
+            )
+        return data
@@ -0,0 +1,27 @@
+"""
+Signals for member gym status changes and the receivers that keep caches fresh
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+from .cache import member_cache, in_gym_cache
+
+# Sent after commit whenever is_in_gym/entry_time change through bulk or
+# conditional updates that bypass post_save. Provides member_ids and reason.
+member_status_changed = Signal()
+
+
+@receiver(post_save, sender="gym.Member")
+@receiver(post_delete, sender="gym.Member")
+def invalidate_saved_member(sender, instance, using, **kwargs):
+    # Invalidating before commit would let a concurrent read cache the old row again
+    member_id = instance.pk
+    transaction.on_commit(lambda: member_cache.invalidate(member_id), using=using)
+    if instance.is_in_gym:
+        transaction.on_commit(in_gym_cache.invalidate, using=using)
+
+
+@receiver(member_status_changed)
+def invalidate_changed_members(sender, member_ids, **kwargs):
+    member_cache.invalidate(*member_ids)
+    in_gym_cache.invalidate()
@@ -0,0 +1,71 @@
+"""
+Sweeper that closes gym sessions left open past SESSION_TIME_LIMIT.
+
+The sweep normally runs on a fixed cadence from the close_long_sessions
+management command. Every run records a "last swept" watermark in the cache
+so request handlers can skip the sweep while the watermark is fresh.
+"""
+from datetime import datetime, timezone as dt_timezone
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import Member, GymOccupancy
+
+LAST_SWEPT_CACHE_KEY = "gym:sessions:last_swept"
+
+
+def get_last_swept():
+    """Return the time of the last sweep, or None if no sweep was recorded"""
+    return _from_timestamp(cache.get(LAST_SWEPT_CACHE_KEY))
+
+
+def _from_timestamp(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+
+def sweep(now=None):
+    """Close all overdue sessions, reconcile occupancy and record the watermark"""
+    now = now or timezone.now()
+    closed_count = Member.objects.close_long_sessions(now=now)
+    GymOccupancy.objects.reconcile()
+    cache.set(LAST_SWEPT_CACHE_KEY, now.timestamp(), timeout=None)
+    return closed_count
+
+
+def sweep_if_stale(max_age=None):
+    """
+    Run a sweep only when the watermark is older than max_age seconds.
+    Defaults to settings.GYM_SWEEP_MAX_AGE; None disables request-time sweeps.
+    """
+    if max_age is None:
+        max_age = getattr(settings, "GYM_SWEEP_MAX_AGE", 60)
+    if max_age is None:
+        return 0
+
+    now = timezone.now()
+    if not _is_stale(get_last_swept(), now, max_age):
+        return 0
+    return sweep(now=now)
+
+
+async def asweep_if_stale(max_age=None):
+    """
+    Async sweep_if_stale for async views. The watermark is read without
+    leaving the event loop; a due sweep runs its transaction in a thread.
+    """
+    if max_age is None:
+        max_age = getattr(settings, "GYM_SWEEP_MAX_AGE", 60)
+    if max_age is None:
+        return 0
+
+    now = timezone.now()
+    if not _is_stale(_from_timestamp(await cache.aget(LAST_SWEPT_CACHE_KEY)), now, max_age):
+        return 0
+    return await sync_to_async(sweep)(now=now)
+
+
+def _is_stale(last_swept, now, max_age):
+    return last_swept is None or (now - last_swept).total_seconds() >= max_age
@@ -0,0 +1,73 @@
+from io import StringIO
+from unittest import skipIf
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from datetime import timedelta
+from .. import analytics
+from ..analytics import occupancy_curve
+from ..models import Member, GymSession
+
+class OccupancyCurveTest(TestCase):
+    """
+    Test cases for the sweep-line occupancy curve
+    """
+    def setUp(self):
+        cache.clear()
+        self.start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+        self.end = self.start + timedelta(hours=2)
+        members = [
+            Member.objects.create_user(phone_number=f"100000000{index}", name=f"Member {index}", password="testpassword")
+            for index in range(3)
+        ]
+        minutes = lambda value: self.start + timedelta(minutes=value)
+        GymSession.objects.record([
+            # Started before the range, so it is clipped to the range start
+            GymSession.closed(minutes(-30), minutes(20), member=members[0]),
+            GymSession.closed(minutes(10), minutes(40), member=members[1]),
+            # Back to back with the previous visit of the same member
+            GymSession.closed(minutes(40), minutes(70), member=members[1]),
+        ])
+        # Open since well before now, so it counts until its auto-close time
+        Member.objects.filter(pk=members[2].pk).update(is_in_gym=True, entry_time=minutes(15))
+
+    def check_curve(self):
+        curve = occupancy_curve(self.start, self.end, interval=timedelta(minutes=15))
+        self.assertEqual([bucket["count"] for bucket in curve["results"]], [1, 3, 2, 2, 2, 1, 1, 0])
+        self.assertEqual(curve["peak"]["count"], 3)
+        self.assertEqual(curve["peak"]["time"], self.start + timedelta(minutes=15))
+        # 20 + 30 + 30 + 90 member-minutes over 120 minutes
+        self.assertAlmostEqual(curve["mean"], 170 / 120)
+
+    def test_python_sweep(self):
+        """Test the pure Python sweep"""
+        numpy, analytics.np = analytics.np, None
+        try:
+            self.check_curve()
+        finally:
+            analytics.np = numpy
+
+    @skipIf(analytics.np is None, "numpy is not installed")
+    def test_numpy_sweep(self):
+        """Test the vectorized sweep gives the same curve"""
+        self.check_curve()
+
+    def test_legacy_long_session(self):
+        """Test that a session longer than SESSION_TIME_LIMIT still overlaps the range once rollups are rebuilt"""
+        # Caches the longest duration before the legacy session exists
+        occupancy_curve(self.start, self.end)
+        member = Member.objects.create_user(phone_number="1000000009", name="Legacy Member", password="testpassword")
+        GymSession.objects.record([
+            GymSession.closed(self.start - timedelta(hours=3), self.start + timedelta(minutes=20), member=member)
+        ])
+        call_command("rebuild_rollups", stdout=StringIO())
+        curve = occupancy_curve(self.start, self.end, interval=timedelta(minutes=15))
+        self.assertEqual([bucket["count"] for bucket in curve["results"]], [2, 4, 2, 2, 2, 1, 1, 0])
+
+    def test_single_pass(self):
+        """Test that the curve takes two queries regardless of the bucket count"""
+        # The first call reads the longest session duration and caches it
+        occupancy_curve(self.start, self.end)
+        with self.assertNumQueries(2):
+            occupancy_curve(self.start, self.end, interval=timedelta(minutes=1))
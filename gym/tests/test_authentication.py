@@ -0,0 +1,207 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from rest_framework import status
+from rest_framework.test import APIClient
+from ..authentication import MemberRefreshToken, MemberClaimsUser, revoke_tokens
+from ..cache import member_cache
+from ..models import Member
+from ..serializers import MemberUpdateSerializer
+from rest_framework_simplejwt.tokens import AccessToken
+
+class StatelessAuthenticationTests(TestCase):
+    """
+    Test cases for authorizing members from access token claims
+    """
+    def setUp(self):
+        cache.clear()
+        self.member = Member.objects.create_user(
+            phone_number="1234567890",
+            name="Test Member",
+            password="testpassword",
+            subscription_start=timezone.now().date(),
+            subscription_end=timezone.now().date() + timedelta(days=30)
+        )
+        self.client = APIClient()
+        self.url = reverse('members-in-gym-count')
+
+    def authenticate(self):
+        token = MemberRefreshToken.for_user(self.member).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_token_claims(self):
+        """Test that tokens carry the staff flag, subscription and version"""
+        token = MemberRefreshToken.for_user(self.member).access_token
+        self.assertFalse(token['is_staff'])
+        self.assertEqual(token['subscription_end'], self.member.subscription_end.isoformat())
+        self.assertEqual(token['ver'], 0)
+
+    def test_no_member_lookup_once_version_is_cached(self):
+        """Test that a warm request only runs the endpoint's own queries"""
+        self.authenticate()
+        self.client.get(self.url)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_revoked_token_rejected(self):
+        """Test that bumping the token version rejects older tokens"""
+        self.authenticate()
+        revoke_tokens([self.member.pk])
+        self.member.refresh_from_db()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.authenticate()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_shortened_subscription_revokes_tokens(self):
+        """Test that ending a subscription early revokes issued tokens"""
+        serializer = MemberUpdateSerializer(
+            self.member,
+            data={'subscription_end': timezone.now().date() - timedelta(days=1)},
+            partial=True
+        )
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+        self.assertEqual(self.member.token_version, 1)
+
+    def test_demoted_staff_token_rejected(self):
+        """Test that saving a member with changed staff or subscription claims revokes tokens"""
+        self.member.is_staff = True
+        self.member.save()
+        self.authenticate()
+        export_url = reverse('session-export')
+        self.assertEqual(self.client.get(export_url).status_code, status.HTTP_200_OK)
+
+        # Demote the member the way the admin does
+        self.member.is_staff = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member.save()
+        self.assertEqual(self.client.get(export_url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get(reverse('stats-daily')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.authenticate()
+        self.assertEqual(self.client.get(export_url).status_code, status.HTTP_403_FORBIDDEN)
+
+        # Saving without touching the claims keeps tokens valid
+        self.member.name = "Renamed Member"
+        self.member.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+        self.member.subscription_end = timezone.now().date() - timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member.save(update_fields=["subscription_end"])
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_renewed_subscription_checked_in_database(self):
+        """Test that stale expired claims are confirmed against the database"""
+        Member.objects.filter(pk=self.member.pk).update(subscription_end=timezone.now().date() - timedelta(days=1))
+        self.member.refresh_from_db()
+        user = MemberClaimsUser(MemberRefreshToken.for_user(self.member).access_token)
+        Member.objects.filter(pk=self.member.pk).update(subscription_end=timezone.now().date() + timedelta(days=30))
+        self.assertTrue(user.has_active_subscription)
+
+    def test_renewal_keeps_tokens_valid(self):
+        """Test that renewing through the update serializer keeps tokens, and refresh picks up the new dates"""
+        Member.objects.filter(pk=self.member.pk).update(subscription_end=timezone.now().date() - timedelta(days=1))
+        self.member.refresh_from_db()
+        refresh = MemberRefreshToken.for_user(self.member)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        renewed_end = timezone.now().date() + timedelta(days=30)
+        serializer = MemberUpdateSerializer(self.member, data={'subscription_end': renewed_end}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer.save()
+        self.assertEqual(self.member.token_version, 0)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+        response = APIClient().post(reverse('token_refresh'), {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        access = AccessToken(response.data['access'])
+        self.assertEqual(access['subscription_end'], renewed_end.isoformat())
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+    def test_refresh_rejected_after_revocation(self):
+        """Test that a refresh token issued before a revocation cannot mint access tokens"""
+        refresh = MemberRefreshToken.for_user(self.member)
+        self.member.subscription_start = timezone.now().date() + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member.save()
+        self.assertEqual(self.member.token_version, 1)
+        response = APIClient().post(reverse('token_refresh'), {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(GYM_STATELESS_AUTH=False, GYM_MEMBER_CACHE={'ENABLED': False})
+    def test_stateless_mode_can_be_disabled(self):
+        """Test that the database lookup is used when the mode is off"""
+        self.authenticate()
+        self.client.get(self.url)
+        # The member lookup, then the endpoint's two queries
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class MemberCacheTests(TestCase):
+    """
+    Test cases for the per-process cache of authenticated members
+    """
+    def setUp(self):
+        member_cache.clear()
+        self.member = Member.objects.create_user(
+            phone_number="1234567890",
+            name="Test Member",
+            password="testpassword",
+            subscription_start=timezone.now().date(),
+            subscription_end=timezone.now().date() + timedelta(days=30)
+        )
+        # A token without claims goes through the cached database lookup
+        token = MemberRefreshToken.for_user(self.member).access_token
+        del token['ver']
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.url = reverse('member-recent-sessions', args=[self.member.id])
+
+    def test_repeat_requests_hit_the_cache(self):
+        """Test that only the first request loads the member"""
+        self.client.get(self.url)
+        # The ETag version lookup and the sessions query
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(member_cache.stats()['hits'], 1)
+        self.assertEqual(member_cache.stats()['misses'], 1)
+
+    def test_invalidated_on_save_and_status_change(self):
+        """Test that saves and enter/exit drop the cached member once committed"""
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member.save()
+            self.assertEqual(member_cache.stats()['size'], 1)
+        self.assertEqual(member_cache.stats()['size'], 0)
+
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Member.objects.enter(self.member.pk)
+        self.assertEqual(member_cache.stats()['size'], 0)
+
+    @override_settings(GYM_MEMBER_CACHE={'MAX_SIZE': 1})
+    def test_bounded_size(self):
+        """Test that the least recently used member is evicted"""
+        member_cache.get(1, lambda: 'first')
+        member_cache.get(2, lambda: 'second')
+        self.assertEqual(member_cache.stats()['size'], 1)
+        self.assertEqual(member_cache.get(2, lambda: 'reloaded'), 'second')
+
+    @override_settings(GYM_MEMBER_CACHE={'ENABLED': False})
+    def test_cache_can_be_disabled(self):
+        """Test that every request loads the member when disabled"""
+        self.client.get(self.url)
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
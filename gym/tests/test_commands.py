@@ -0,0 +1,237 @@
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from datetime import timedelta
+from ..models import Member, GymSession
+
+
+class UpdateSubscriptionStatusCommandTest(TestCase):
+    """
+    Test cases for the chunked update_subscription_status command
+    """
+    def setUp(self):
+        today = timezone.now().date()
+        self.members = [
+            Member.objects.create_user(
+                phone_number=f"100000000{i}",
+                name=f"Member {i}",
+                password="testpassword",
+                subscription_start=today - timedelta(days=60),
+                subscription_end=today - timedelta(days=1) if i % 2 else today + timedelta(days=30)
+            )
+            for i in range(5)
+        ]
+        # Simulate stale stored statuses from yesterday's run
+        Member.objects.update(subscription_active=True)
+
+    def test_dry_run_writes_nothing(self):
+        """Test that --dry-run reports changes without writing them"""
+        out = StringIO()
+        call_command('update_subscription_status', '--dry-run', '--batch-size=2', stdout=out)
+        self.assertIn('would update subscription status: 0 activated, 2 expired', out.getvalue())
+        self.assertEqual(Member.objects.filter(subscription_active=False).count(), 0)
+
+    def test_batched_update(self):
+        """Test that small batches update every changed member once"""
+        out = StringIO()
+        call_command('update_subscription_status', '--batch-size=2', stdout=out)
+        self.assertIn('0 activated, 2 expired', out.getvalue())
+        self.assertIn('5 members checked', out.getvalue())
+        self.assertEqual(Member.objects.filter(subscription_active=False).count(), 2)
+
+
+class ResetGymStatusCommandTest(TestCase):
+    """
+    Test cases for the midnight reset_gym_status command
+    """
+    def setUp(self):
+        self.midnight = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.late_member = Member.objects.create_user(
+            phone_number="1000000001",
+            name="Late Member",
+            password="testpassword",
+            is_in_gym=True,
+            entry_time=self.midnight - timedelta(minutes=30)
+        )
+        self.forgetful_member = Member.objects.create_user(
+            phone_number="1000000002",
+            name="Forgetful Member",
+            password="testpassword",
+            is_in_gym=True,
+            entry_time=self.midnight - timedelta(hours=5)
+        )
+        self.no_entry_member = Member.objects.create_user(
+            phone_number="1000000003",
+            name="No Entry Member",
+            password="testpassword",
+            is_in_gym=True
+        )
+
+    def test_reset_caps_exit_time(self):
+        """Test that sessions end at the time limit or midnight, whichever is first"""
+        out = StringIO()
+        call_command('reset_gym_status', stdout=out)
+        self.assertIn('for 3 members (2 sessions recorded', out.getvalue())
+        self.assertFalse(Member.objects.filter(is_in_gym=True).exists())
+
+        late_session = GymSession.objects.get(member=self.late_member)
+        self.assertEqual(late_session.exit_time, self.midnight)
+        self.assertEqual(late_session.duration, 30)
+        forgetful_session = GymSession.objects.get(member=self.forgetful_member)
+        self.assertEqual(forgetful_session.duration, 90)
+
+    def test_reset_keeps_members_entered_after_midnight(self):
+        """Test that morning entries made after midnight are not reset"""
+        Member.objects.filter(pk=self.late_member.pk).update(entry_time=timezone.now())
+        call_command('reset_gym_status', stdout=StringIO())
+        self.late_member.refresh_from_db()
+        self.assertTrue(self.late_member.is_in_gym)
+
+
+class BenchmarkLoginCommandTest(TestCase):
+    """
+    Test cases for the benchmark_login command
+    """
+    def test_reports_each_hasher(self):
+        """Test that every configured hasher gets a throughput line"""
+        out = StringIO()
+        call_command('benchmark_login', logins=1, stdout=out)
+        self.assertIn('scrypt', out.getvalue())
+        self.assertIn('pbkdf2_sha256', out.getvalue())
+        self.assertIn('logins/sec/core', out.getvalue())
+
+
+class ImportMembersCommandTest(TestCase):
+    """
+    Test cases for the import_members command
+    """
+    def setUp(self):
+        self.existing = Member.objects.create_user(
+            phone_number="1000000001",
+            name="Existing Member",
+            password="testpassword",
+            subscription_start=timezone.now().date(),
+            subscription_end=timezone.now().date() + timedelta(days=30)
+        )
+        future = (timezone.now().date() + timedelta(days=60)).isoformat()
+        self.path = self.write_csv(
+            "phone_number,name,password,subscription_start,subscription_end\n"
+            f"2000000001,New Member,secret1,,{future}\n"
+            "2000000002,,secret2,,\n"
+            f"1000000001,Renamed Member,secret3,,{future}\n"
+            "2000000001,Duplicate Member,secret4,,\n"
+            "2000000003,Bad Dates,secret5,2024-02-01,2024-01-01\n"
+        )
+
+    def write_csv(self, content):
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w") as csv_file:
+            csv_file.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_import_reports_row_errors(self):
+        """Test that valid rows are created and failing rows are reported"""
+        out, err = StringIO(), StringIO()
+        call_command('import_members', self.path, chunk_size=2, workers=1, stdout=out, stderr=err)
+        self.assertIn('1 created, 0 updated, 1 skipped, 3 failed', out.getvalue())
+        self.assertIn('Row 3: name:', err.getvalue())
+        self.assertIn('Row 5: phone_number: Duplicate', err.getvalue())
+        self.assertIn('Row 6: subscription_end:', err.getvalue())
+
+        member = Member.objects.get(phone_number="2000000001")
+        self.assertTrue(member.check_password("secret1"))
+        self.assertTrue(member.subscription_active)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.name, "Existing Member")
+
+    def test_update_existing(self):
+        """Test that existing members are updated but keep their password"""
+        out = StringIO()
+        call_command('import_members', self.path, update_existing=True, workers=1, stdout=out, stderr=StringIO())
+        self.assertIn('1 created, 1 updated, 0 skipped', out.getvalue())
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.name, "Renamed Member")
+        self.assertTrue(self.existing.check_password("testpassword"))
+
+    def import_racing_chunk(self, update_existing):
+        """Import a chunk while a member registers one of its phone numbers after the existence check"""
+        from django.contrib.auth.hashers import make_password
+        from ..importer import _import_chunk
+
+        class RacingPool:
+            def map(self, function, passwords, chunksize=1):
+                # Registers while the chunk's passwords are being hashed
+                Member.objects.create_user(phone_number="2000000002", name="Registered", password="own")
+                return [make_password(password) for password in passwords]
+
+        rows = [
+            (2, {"phone_number": "2000000001", "name": "New Member", "password": "secret1"}),
+            (3, {"phone_number": "2000000002", "name": "Racing Member", "password": "secret2"}),
+            (4, {"phone_number": "1000000001", "name": "Renamed Member", "password": "secret3"}),
+        ]
+        result = {"created": 0, "updated": 0, "skipped": 0, "errors": []}
+        _import_chunk(rows, RacingPool(), 1, update_existing, set(), result)
+        registered = Member.objects.get(phone_number="2000000002")
+        self.assertEqual(registered.name, "Registered")
+        self.assertTrue(registered.check_password("own"))
+        return result
+
+    def test_member_registered_during_import_skipped(self):
+        """Test that a phone number registered after the existence check counts as skipped"""
+        result = self.import_racing_chunk(update_existing=False)
+        self.assertEqual((result["created"], result["updated"], result["skipped"]), (1, 0, 2))
+
+    def test_member_registered_during_update_import_kept(self):
+        """Test that updating imports do not overwrite a member registered after the existence check"""
+        result = self.import_racing_chunk(update_existing=True)
+        self.assertEqual((result["created"], result["updated"], result["skipped"]), (1, 1, 1))
+
+    def test_update_existing_changes_in_gym_version(self):
+        """Test that updating an in-gym member changes the occupancy revision the in-gym ETag uses"""
+        from ..models import GymOccupancy
+
+        self.existing.enter_gym()
+        revision = GymOccupancy.objects.get().revision
+        call_command('import_members', self.path, update_existing=True, workers=1, stdout=StringIO(), stderr=StringIO())
+        self.assertGreater(GymOccupancy.objects.get().revision, revision)
+
+
+class ExportSessionsCommandTest(TestCase):
+    """
+    Test cases for the export_sessions command
+    """
+    def setUp(self):
+        self.member = Member.objects.create_user(
+            phone_number="1000000001",
+            name="Export Member",
+            password="testpassword"
+        )
+        now = timezone.now()
+        for days in (40, 10, 1):
+            GymSession.closed(now - timedelta(days=days), now - timedelta(days=days) + timedelta(hours=1), member=self.member).save()
+
+    def test_csv_export_with_date_filter(self):
+        """Test that the export honours the date range and writes a header"""
+        out, err = StringIO(), StringIO()
+        start = (timezone.now() - timedelta(days=20)).date().isoformat()
+        call_command('export_sessions', start=start, chunk_size=1, stdout=out, stderr=err)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'id,member_id,member_name,entry_time,exit_time,duration')
+        self.assertEqual(len(lines), 3)
+        self.assertIn('Export Member', lines[1])
+        self.assertIn('Exported 2 sessions', err.getvalue())
+
+    def test_ndjson_export(self):
+        """Test that NDJSON output has one object per session"""
+        import json
+
+        out = StringIO()
+        call_command('export_sessions', output_format='ndjson', stdout=out, stderr=StringIO())
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['duration'], 60)
+        self.assertLess(rows[0]['entry_time'], rows[-1]['entry_time'])
@@ -1,10 +1,21 @@
-from django.test import TestCase
-from django.urls import reverse
-from rest_framework.test import APIClient
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.test import AsyncRequestFactory, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import NoReverseMatch, reverse
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
 from rest_framework import status
 from django.utils import timezone
 from datetime import timedelta
-from ..models import Member
+from ..async_views import occupancy_stream
+from ..authentication import MemberRefreshToken, StreamToken
+from ..cache import in_gym_cache
+from ..events import MemoryBroker, get_broker
+from ..models import Member, GymSession, GymOccupancy
+from ..signals import member_status_changed
+from ..views import StreamTokenView
 
 class InGymMembersViewTest(TestCase):
     """
@@ -68,6 +79,7 @@ class InGymMembersViewTest(TestCase):
         )
         
         self.client = APIClient()
+        in_gym_cache.clear()
     
     def test_in_gym_members_admin_access(self):
         """Test that admin users can access the in-gym members endpoint"""
@@ -85,6 +97,28 @@ class InGymMembersViewTest(TestCase):
         self.assertIn(self.in_gym_member2.id, member_ids)
         self.assertNotIn(self.not_in_gym_member.id, member_ids)
     
+    def test_in_gym_members_excludes_overdue_sessions(self):
+        """Test that overdue sessions count as closed without writing to the database"""
+        overdue_member = Member.objects.create_user(
+            phone_number="4444444444",
+            name="Overdue Member",
+            password="password",
+            is_in_gym=True,
+            entry_time=timezone.now() - timedelta(hours=2)
+        )
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('members-in-gym'))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        member_ids = [member['id'] for member in response.data['members']]
+        self.assertNotIn(overdue_member.id, member_ids)
+        
+        # The read did not persist anything
+        overdue_member.refresh_from_db()
+        self.assertTrue(overdue_member.is_in_gym)
+        self.assertEqual(GymSession.objects.count(), 0)
+    
     def test_in_gym_members_regular_user_access(self):
         """Test that regular users with active subscription can access the in-gym members endpoint"""
         self.client.force_authenticate(user=self.regular_user)
@@ -114,3 +148,231 @@ class InGymMembersViewTest(TestCase):
         response = self.client.get(url)
         
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class OccupancyCounterTest(TestCase):
+    """
+    Test cases for the maintained occupancy counter
+    """
+    def setUp(self):
+        self.member = Member.objects.create_user(
+            phone_number="1234567890",
+            name="Test Member",
+            password="password",
+            subscription_start=timezone.now().date(),
+            subscription_end=timezone.now().date() + timedelta(days=30)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.member)
+
+    def test_counter_follows_enter_exit_and_auto_close(self):
+        """Test that enter, exit and auto-close keep the counter in step"""
+        self.assertEqual(GymOccupancy.objects.current(), 0)
+        Member.objects.enter(self.member.pk)
+        self.assertEqual(GymOccupancy.objects.current(), 1)
+        Member.objects.exit(self.member.pk)
+        self.assertEqual(GymOccupancy.objects.current(), 0)
+
+        # An overdue session is left out before the sweeper closes it
+        Member.objects.enter(self.member.pk, now=timezone.now() - timedelta(hours=2))
+        self.assertEqual(GymOccupancy.objects.get().count, 1)
+        self.assertEqual(GymOccupancy.objects.current(), 0)
+        Member.objects.close_long_sessions()
+        self.assertEqual(GymOccupancy.objects.get().count, 0)
+        self.assertEqual(GymOccupancy.objects.current(), 0)
+
+    def test_reconcile(self):
+        """Test that reconcile repairs a drifted counter"""
+        Member.objects.filter(pk=self.member.pk).update(is_in_gym=True)
+        self.assertEqual(GymOccupancy.objects.reconcile(), 1)
+        self.assertEqual(GymOccupancy.objects.current(), 1)
+
+    def test_count_endpoint(self):
+        """Test that the count endpoint reads the counter and the overdue count"""
+        Member.objects.enter(self.member.pk)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('members-in-gym-count'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+
+        # Overdue sessions are not counted, matching the in-gym list
+        Member.objects.filter(pk=self.member.pk).update(entry_time=timezone.now() - timedelta(hours=3))
+        response = self.client.get(reverse('members-in-gym-count'))
+        self.assertEqual(response.data['count'], 0)
+        self.assertEqual(self.client.get(reverse('members-in-gym')).data['count'], 0)
+
+
+class InGymCacheTest(TestCase):
+    """
+    Test cases for the shared in-gym list cache
+    """
+    def setUp(self):
+        self.member = Member.objects.create_user(
+            phone_number="1234567890",
+            name="Test Member",
+            password="password",
+            subscription_start=timezone.now().date(),
+            subscription_end=timezone.now().date() + timedelta(days=30)
+        )
+        self.admin = Member.objects.create_user(
+            phone_number="9999999999",
+            name="Admin User",
+            password="adminpassword",
+            is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.member)
+        self.url = reverse('members-in-gym')
+        in_gym_cache.clear()
+
+    def test_repeat_requests_hit_the_cache(self):
+        """Test that the list is only built once between writes"""
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Only the ETag version lookups run
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(in_gym_cache.stats()['hits'], 1)
+        self.assertEqual(in_gym_cache.stats()['misses'], 1)
+
+    def test_invalidated_by_status_changes(self):
+        """Test that enter and exit drop the cached list once committed"""
+        self.assertEqual(self.client.get(self.url).data['count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Member.objects.enter(self.member.pk)
+        self.assertEqual(self.client.get(self.url).data['count'], 1)
+
+        # Renaming a member in the gym changes the list too
+        member = Member.objects.get(pk=self.member.pk)
+        member.name = "Renamed Member"
+        with self.captureOnCommitCallbacks(execute=True):
+            member.save()
+            self.assertEqual(self.client.get(self.url).data['members'][0]['name'], "Test Member")
+        self.assertEqual(self.client.get(self.url).data['members'][0]['name'], "Renamed Member")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Member.objects.exit(self.member.pk)
+        self.assertEqual(self.client.get(self.url).data['count'], 0)
+
+    def test_entry_expires_with_first_overdue_session(self):
+        """Test that a cached list expires when its oldest session becomes overdue"""
+        from ..views import InGymMembersView
+
+        entry_time = timezone.now() - timedelta(hours=1)
+        Member.objects.filter(pk=self.member.pk).update(is_in_gym=True, entry_time=entry_time)
+        view = InGymMembersView(request=None, format_kwarg=None)
+        data, expires_at = view.build_members()
+        self.assertEqual(len(data), 1)
+        self.assertEqual(expires_at, entry_time + timedelta(hours=1, minutes=30))
+
+    def test_stats_endpoint(self):
+        """Test that admins can read the hit ratio and rebuild latency"""
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('stats-cache'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['in_gym_cache']['hit_ratio'], 0.5)
+        self.assertIn('average_rebuild_ms', response.data['in_gym_cache'])
+
+
+class OccupancyStreamTest(TestCase):
+    """
+    Test cases for the Server-Sent Events occupancy stream
+    """
+    def setUp(self):
+        self.member = Member.objects.create_user(
+            phone_number="1234567890",
+            name="Test Member",
+            password="password",
+            subscription_start=timezone.now().date(),
+            subscription_end=timezone.now().date() + timedelta(days=30)
+        )
+        self.factory = AsyncRequestFactory()
+        self.stream_token = str(StreamToken.for_user(self.member))
+
+    async def test_memory_broker_fans_out(self):
+        """Test that every subscriber receives a published event"""
+        broker = MemoryBroker()
+        first, second = broker.subscribe(), broker.subscribe()
+        pending = [asyncio.ensure_future(anext(first)), asyncio.ensure_future(anext(second))]
+        await asyncio.sleep(0)
+        self.assertTrue(broker.has_subscribers())
+
+        broker.publish({"type": "enter"})
+        events = await asyncio.wait_for(asyncio.gather(*pending), 5)
+        self.assertEqual(events, [{"type": "enter"}, {"type": "enter"}])
+
+        await first.aclose()
+        await second.aclose()
+        self.assertFalse(broker.has_subscribers())
+
+    async def test_stream_pushes_status_changes(self):
+        """Test that the stream sends a snapshot, then each status change"""
+        response = await occupancy_stream(self.factory.get("/", {"token": self.stream_token}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+        content = aiter(response.streaming_content)
+        snapshot = await asyncio.wait_for(anext(content), 5)
+        self.assertTrue(snapshot.startswith(b"event: occupancy\n"))
+
+        pending = asyncio.ensure_future(anext(content))
+        await asyncio.sleep(0)
+        await sync_to_async(GymOccupancy.objects.adjust)(1)
+        await sync_to_async(member_status_changed.send)(
+            sender=Member, member_ids=[self.member.pk], reason="enter"
+        )
+        message = (await asyncio.wait_for(pending, 5)).decode()
+        event_type, data = message.strip().split("\n")
+        self.assertEqual(event_type, "event: enter")
+        event = json.loads(data.removeprefix("data: "))
+        self.assertEqual(event["member_ids"], [self.member.pk])
+        self.assertEqual(event["occupancy"], 1)
+
+        # A client disconnect cancels the pending read, which unsubscribes
+        pending = asyncio.ensure_future(anext(content))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertFalse(get_broker().has_subscribers())
+
+    async def test_stream_requires_stream_token(self):
+        """Test that ?token= rejects missing, invalid and long-lived access tokens"""
+        response = await occupancy_stream(self.factory.get("/"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await occupancy_stream(self.factory.get("/", {"token": "invalid"}))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        access_token = str(MemberRefreshToken.for_user(self.member).access_token)
+        response = await occupancy_stream(self.factory.get("/", {"token": access_token}))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_stream_requires_asgi(self):
+        """Test that a WSGI request is refused instead of buffering forever"""
+        response = await occupancy_stream(RequestFactory().get("/", {"token": self.stream_token}))
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    def test_stream_only_routed_with_async_views(self):
+        """Test that the default WSGI setup does not register the stream"""
+        with self.assertRaises(NoReverseMatch):
+            reverse('members-in-gym-stream')
+
+    def test_stream_token_endpoint(self):
+        """Test that members get a one-minute stream token, and expired subscriptions none"""
+        request = APIRequestFactory().post("/")
+        force_authenticate(request, user=self.member)
+        response = StreamTokenView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        token = StreamToken(response.data["token"])
+        self.assertEqual(token["user_id"], self.member.pk)
+        self.assertLessEqual(token["exp"] - token["iat"], 60)
+
+        Member.objects.filter(pk=self.member.pk).update(
+            subscription_end=timezone.now().date() - timedelta(days=1)
+        )
+        self.member.refresh_from_db()
+        request = APIRequestFactory().post("/")
+        force_authenticate(request, user=self.member)
+        self.assertEqual(StreamTokenView.as_view()(request).status_code, status.HTTP_403_FORBIDDEN)
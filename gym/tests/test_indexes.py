@@ -0,0 +1,35 @@
+import unittest
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from ..models import Member, GymSession
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite specific')
+class QueryPlanTests(TestCase):
+    """
+    Test cases asserting that the hot queries are served by an index
+    """
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def test_in_gym_members(self):
+        """Test the in-gym list and overdue sweep use the partial index"""
+        self.assertUsesIndex(Member.objects.in_gym(), 'gym_member_in_gym_entry_idx')
+        self.assertUsesIndex(Member.objects.overdue(), 'gym_member_in_gym_entry_idx')
+        self.assertUsesIndex(Member.objects.filter(is_in_gym=True), 'gym_member_in_gym_entry_idx')
+
+    def test_recent_sessions_of_member(self):
+        """Test a member's recent sessions use the (member, -entry_time) index"""
+        queryset = GymSession.objects.filter(member_id=1).order_by('-entry_time')[:50]
+        self.assertUsesIndex(queryset, 'gym_session_member_entry_idx')
+
+    def test_session_cursor_page(self):
+        """Test a cursor page over all sessions uses the (-entry_time, -id) index"""
+        queryset = GymSession.objects.filter(entry_time__lt=timezone.now()).order_by('-entry_time', '-id')[:100]
+        self.assertUsesIndex(queryset, 'gym_session_entry_id_idx')
+
+    def test_subscription_end_report(self):
+        """Test expiry reports filter through the subscription_end index"""
+        queryset = Member.objects.filter(subscription_end__lt=timezone.now().date())
+        self.assertUsesIndex(queryset, 'gym_member_sub_end_idx')
@@ -1,7 +1,9 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from datetime import timedelta
-from ..models import Member, GymSession
+from ..models import Member, GymSession, DailyMemberStats, HourlyOccupancy, MemberStats
 
 class MemberModelTest(TestCase):
     """
@@ -37,6 +39,32 @@ class MemberModelTest(TestCase):
         self.assertTrue(self.active_member.has_active_subscription)
         self.assertFalse(self.expired_member.has_active_subscription)
         
+    def test_subscription_queryset_matches_property(self):
+        """Test that active()/expired() agree with has_active_subscription"""
+        future_member = Member.objects.create_user(
+            phone_number="5555555555",
+            name="Future Member",
+            password="testpassword",
+            subscription_start=timezone.now().date() + timedelta(days=5)
+        )
+        active_ids = set(Member.objects.active().values_list('pk', flat=True))
+        expired_ids = set(Member.objects.expired().values_list('pk', flat=True))
+        for member in (self.active_member, self.expired_member, future_member):
+            self.assertEqual(member.pk in active_ids, member.has_active_subscription)
+            self.assertEqual(member.pk in expired_ids, not member.has_active_subscription)
+            self.assertEqual(member.subscription_active, member.has_active_subscription)
+
+        annotated = Member.objects.with_subscription_status().get(pk=self.expired_member.pk)
+        self.assertFalse(annotated.subscription_is_active)
+
+    def test_refresh_subscription_status(self):
+        """Test that the stored status is recomputed only for changed members"""
+        Member.objects.filter(pk=self.expired_member.pk).update(subscription_active=True)
+        self.assertEqual(Member.objects.refresh_subscription_status(), (0, 1))
+        self.assertEqual(Member.objects.refresh_subscription_status(), (0, 0))
+        self.expired_member.refresh_from_db()
+        self.assertFalse(self.expired_member.subscription_active)
+
     def test_enter_gym(self):
         """Test the enter_gym method"""
         # Test successful entry
@@ -71,6 +99,28 @@ class MemberModelTest(TestCase):
         self.assertFalse(success)
         self.assertEqual(message, "Not currently in the gym")
         
+    def test_repeated_scans_record_one_session(self):
+        """Test that retried enter/exit scans do not double-enter or duplicate sessions"""
+        pk = self.active_member.pk
+        self.assertTrue(Member.objects.enter(pk)[0])
+        self.assertFalse(Member.objects.enter(pk)[0])
+        self.assertTrue(Member.objects.exit(pk)[0])
+        self.assertFalse(Member.objects.exit(pk)[0])
+        self.assertEqual(GymSession.objects.count(), 1)
+
+    def test_enter_exit_only_write_status_fields(self):
+        """Test that enter/exit never rewrite unrelated columns such as the password"""
+        with CaptureQueriesContext(connection) as queries:
+            Member.objects.enter(self.active_member.pk)
+            Member.objects.exit(self.active_member.pk)
+        updates = [
+            q['sql'] for q in queries.captured_queries
+            if q['sql'].startswith('UPDATE "gym_member"')
+        ]
+        self.assertEqual(len(updates), 2)
+        for sql in updates:
+            self.assertNotIn('"password"', sql)
+
     def test_str_method(self):
         """Test the string representation of a Member"""
         expected = f"Active Member (1234567890)"
@@ -129,3 +179,138 @@ class GymSessionModelTest(TestCase):
         sessions = GymSession.objects.all()
         self.assertEqual(sessions[0], self.session)  # More recent session first
         self.assertEqual(sessions[1], earlier_session)  # Earlier session second
+
+
+class CloseLongSessionsTest(TestCase):
+    """
+    Test cases for the bulk auto-close of long gym sessions
+    """
+    def setUp(self):
+        now = timezone.now()
+        self.overdue_members = [
+            Member.objects.create_user(
+                phone_number=f"100000000{i}",
+                name=f"Overdue Member {i}",
+                password="testpassword",
+                is_in_gym=True,
+                entry_time=now - timedelta(hours=2, minutes=i)
+            )
+            for i in range(3)
+        ]
+        self.recent_member = Member.objects.create_user(
+            phone_number="2000000000",
+            name="Recent Member",
+            password="testpassword",
+            is_in_gym=True,
+            entry_time=now - timedelta(minutes=30)
+        )
+
+    def test_close_long_sessions(self):
+        """Test that only overdue sessions are closed and recorded"""
+        closed = Member.objects.close_long_sessions()
+        self.assertEqual(closed, 3)
+        self.assertEqual(GymSession.objects.count(), 3)
+
+        for member in self.overdue_members:
+            member.refresh_from_db()
+            self.assertFalse(member.is_in_gym)
+            self.assertIsNone(member.entry_time)
+            self.assertEqual(member.sessions.count(), 1)
+
+        self.recent_member.refresh_from_db()
+        self.assertTrue(self.recent_member.is_in_gym)
+        self.assertIsNotNone(self.recent_member.entry_time)
+
+    def test_close_long_sessions_is_idempotent(self):
+        """Test that a second pass finds nothing left to close"""
+        Member.objects.close_long_sessions()
+        self.assertEqual(Member.objects.close_long_sessions(), 0)
+        self.assertEqual(GymSession.objects.count(), 3)
+
+
+class AttendanceRollupTest(TestCase):
+    """
+    Test cases for the DailyMemberStats and HourlyOccupancy rollups
+    """
+    def setUp(self):
+        self.member = Member.objects.create_user(
+            phone_number="1234567890",
+            name="Test Member",
+            password="testpassword"
+        )
+        # 10:40 local time, so a 40 minute session spans two clock hours
+        self.entry = timezone.localtime().replace(hour=10, minute=40, second=0, microsecond=0) - timedelta(days=1)
+
+    def test_exit_updates_rollups(self):
+        """Test that an exit adds the session to the daily and hourly rollups"""
+        Member.objects.filter(pk=self.member.pk).update(is_in_gym=True, entry_time=self.entry)
+        Member.objects.exit(self.member.pk, now=self.entry + timedelta(minutes=40))
+
+        daily = DailyMemberStats.objects.get(member=self.member)
+        self.assertEqual((daily.date, daily.visits, daily.total_duration), (self.entry.date(), 1, 40))
+        hours = list(HourlyOccupancy.objects.order_by("hour"))
+        self.assertEqual([row.visits for row in hours], [1, 0])
+        self.assertEqual([row.occupied_minutes for row in hours], [20, 20])
+
+    def test_exit_updates_rollups_in_place(self):
+        """Test that an exit increments existing rollup rows with one UPDATE each"""
+        # Both sessions span the same two clock hours
+        for minutes in (0, 5):
+            entry = self.entry + timedelta(minutes=minutes)
+            Member.objects.filter(pk=self.member.pk).update(is_in_gym=True, entry_time=entry)
+            with CaptureQueriesContext(connection) as queries:
+                Member.objects.exit(self.member.pk, now=entry + timedelta(minutes=40))
+        # Savepoint, lock, clear, occupancy, session, daily, 2 hours, member stats, release
+        self.assertEqual(len(queries), 10)
+        self.assertEqual(DailyMemberStats.objects.get(member=self.member).visits, 2)
+        self.assertEqual(MemberStats.objects.get(member=self.member).total_visits, 2)
+
+    def test_in_place_member_stats_match_add_day(self):
+        """Test that the UPDATE expressions for one day give the same row as add_day"""
+        first = self.entry.date().replace(day=1) - timedelta(days=40)
+        days = [
+            first, first + timedelta(days=1), first + timedelta(days=1), first,
+            first + timedelta(days=3), first + timedelta(days=4), first + timedelta(days=40),
+        ]
+        expected = MemberStats(member=self.member)
+        for index, day in enumerate(days):
+            expected.add_day(day, 1, 10 + index)
+            MemberStats.objects.add_days({(self.member.pk, day): (1, 10 + index)})
+            stored = MemberStats.objects.get(member=self.member)
+            self.assertEqual(
+                [getattr(stored, field) for field in MemberStats.COUNTER_FIELDS],
+                [getattr(expected, field) for field in MemberStats.COUNTER_FIELDS],
+            )
+
+    def test_auto_close_paths_update_rollups(self):
+        """Test that swept and door event sessions are counted once each"""
+        Member.objects.filter(pk=self.member.pk).update(is_in_gym=True, entry_time=self.entry)
+        Member.objects.close_long_sessions(now=self.entry + timedelta(hours=2))
+        Member.objects.apply_door_events([
+            {"member_id": self.member.pk, "direction": "enter", "timestamp": self.entry + timedelta(hours=3)},
+            {"member_id": self.member.pk, "direction": "exit", "timestamp": self.entry + timedelta(hours=4)},
+        ])
+
+        daily = DailyMemberStats.objects.get(member=self.member)
+        self.assertEqual((daily.visits, daily.total_duration), (2, 150))
+        self.assertEqual(sum(HourlyOccupancy.objects.values_list("occupied_minutes", flat=True)), 150)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        """Test that rebuild_rollups recomputes the same rows from raw sessions"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        for days in range(3):
+            entry = self.entry - timedelta(days=days)
+            GymSession.objects.record([GymSession.closed(entry, entry + timedelta(minutes=50), member=self.member)])
+        expected = list(HourlyOccupancy.objects.order_by("hour").values_list("hour", "visits", "occupied_minutes"))
+        DailyMemberStats.objects.update(visits=0)
+
+        out = StringIO()
+        call_command('rebuild_rollups', chunk_size=2, stdout=out)
+        self.assertIn('from 3 sessions: 3 member days, 6 hours', out.getvalue())
+        self.assertEqual(
+            list(HourlyOccupancy.objects.order_by("hour").values_list("hour", "visits", "occupied_minutes")),
+            expected
+        )
+        self.assertEqual(list(DailyMemberStats.objects.values_list("visits", flat=True)), [1, 1, 1])
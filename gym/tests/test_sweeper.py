@@ -0,0 +1,54 @@
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from datetime import timedelta
+from ..models import Member, GymSession
+from ..sweeper import get_last_swept, sweep, sweep_if_stale
+
+class SweeperTest(TestCase):
+    """
+    Test cases for the stale session sweeper and its watermark
+    """
+    def setUp(self):
+        cache.clear()
+        self.member = Member.objects.create_user(
+            phone_number="1234567890",
+            name="Test Member",
+            password="testpassword",
+            is_in_gym=True,
+            entry_time=timezone.now() - timedelta(hours=2)
+        )
+
+    def test_sweep_records_watermark(self):
+        """Test that a sweep closes overdue sessions and records the watermark"""
+        self.assertIsNone(get_last_swept())
+        self.assertEqual(sweep(), 1)
+        self.assertIsNotNone(get_last_swept())
+        self.assertEqual(GymSession.objects.count(), 1)
+
+    def test_sweep_if_stale_skips_fresh_watermark(self):
+        """Test that request-time sweeps are skipped while the watermark is fresh"""
+        sweep()
+        Member.objects.filter(pk=self.member.pk).update(
+            is_in_gym=True,
+            entry_time=timezone.now() - timedelta(hours=2)
+        )
+        self.assertEqual(sweep_if_stale(max_age=60), 0)
+        self.assertEqual(sweep_if_stale(max_age=0), 1)
+
+    @override_settings(GYM_SWEEP_MAX_AGE=None)
+    def test_sweep_if_stale_disabled(self):
+        """Test that request-time sweeps can be turned off completely"""
+        self.assertEqual(sweep_if_stale(), 0)
+        self.member.refresh_from_db()
+        self.assertTrue(self.member.is_in_gym)
+
+    def test_close_long_sessions_command(self):
+        """Test the close_long_sessions management command"""
+        out = StringIO()
+        call_command('close_long_sessions', stdout=out)
+        self.assertIn('Closed 1 sessions', out.getvalue())
+        self.member.refresh_from_db()
+        self.assertFalse(self.member.is_in_gym)
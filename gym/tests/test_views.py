@@ -1,10 +1,16 @@
-from django.test import TestCase
+import json
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
-from ..models import Member
+from .. import async_views
+from ..authentication import MemberRefreshToken
+from ..cache import in_gym_cache
+from ..models import Member, GymSession, MemberStats
 from rest_framework_simplejwt.tokens import RefreshToken
 
 class SerializerTests(TestCase):
@@ -136,6 +142,21 @@ class AuthViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('error', response.data)
 
+    def test_login_rehashes_legacy_password(self):
+        """Test that a password stored with an older hasher is upgraded on login"""
+        from django.contrib.auth.hashers import identify_hasher, make_password
+
+        Member.objects.filter(pk=self.member.pk).update(
+            password=make_password('testpassword', hasher='pbkdf2_sha256')
+        )
+        data = {'phone_number': '1234567890', 'password': 'testpassword'}
+        response = self.client.post(reverse('login'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.member.refresh_from_db()
+        self.assertNotEqual(identify_hasher(self.member.password).algorithm, 'pbkdf2_sha256')
+        self.assertTrue(self.member.check_password('testpassword'))
+
 
 class GymOperationsTests(APITestCase):
     """
@@ -193,3 +214,652 @@ class GymOperationsTests(APITestCase):
         response = self.client.post(url)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('error', response.data)
+
+
+class PendingSessionTests(APITestCase):
+    """
+    Test cases for overdue sessions synthesized at read time
+    """
+    def setUp(self):
+        self.entry_time = timezone.now() - timedelta(hours=2)
+        self.member = Member.objects.create_user(
+            phone_number="1234567890",
+            name="Test Member",
+            password="testpassword",
+            subscription_start=timezone.now().date(),
+            subscription_end=timezone.now().date() + timedelta(days=30),
+            is_in_gym=True,
+            entry_time=self.entry_time
+        )
+        self.client.force_authenticate(user=self.member)
+
+    def test_session_list_includes_pending_session(self):
+        """Test that an overdue session is listed as closed after 1.5 hours"""
+        response = self.client.get(reverse('session-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(len(results), 1)
+        self.assertIsNone(results[0]['id'])
+        self.assertEqual(results[0]['member_name'], "Test Member")
+        self.assertEqual(results[0]['duration'], 90)
+        self.assertEqual(GymSession.objects.count(), 0)
+
+    def test_recent_sessions_include_pending_session(self):
+        """Test that recent sessions list the overdue session first"""
+        GymSession.objects.create(
+            member=self.member,
+            entry_time=self.entry_time - timedelta(days=1),
+            exit_time=self.entry_time - timedelta(days=1) + timedelta(hours=1),
+            duration=60
+        )
+        url = reverse('member-recent-sessions', args=[self.member.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertIsNone(response.data['sessions'][0]['id'])
+
+    def test_enter_closes_overdue_session(self):
+        """Test that entering persists the overdue session before re-entering"""
+        response = self.client.post(reverse('member-enter', args=[self.member.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        session = GymSession.objects.get()
+        self.assertEqual(session.entry_time, self.entry_time)
+        self.assertEqual(session.duration, 90)
+
+
+class DoorEventBatchTests(APITestCase):
+    """
+    Test cases for the batch door-event endpoint
+    """
+    def setUp(self):
+        self.admin = Member.objects.create_user(
+            phone_number="9999999999",
+            name="Admin User",
+            password="adminpassword",
+            is_staff=True
+        )
+        self.member = Member.objects.create_user(
+            phone_number="1234567890",
+            name="Test Member",
+            password="testpassword",
+            subscription_start=timezone.now().date(),
+            subscription_end=timezone.now().date() + timedelta(days=30)
+        )
+        self.url = reverse('door-events')
+        self.client.force_authenticate(user=self.admin)
+
+    def test_replayed_events_use_event_timestamps(self):
+        """Test that replayed scans are applied in order with their own timestamps"""
+        entry = timezone.now() - timedelta(hours=1)
+        exit_time = entry + timedelta(minutes=45)
+        events = [
+            {'member_id': self.member.id, 'direction': 'enter', 'timestamp': entry.isoformat()},
+            {'member_id': self.member.id, 'direction': 'enter', 'timestamp': entry.isoformat()},
+            {'member_id': self.member.id, 'direction': 'exit', 'timestamp': exit_time.isoformat()},
+            {'member_id': 12345, 'direction': 'enter', 'timestamp': exit_time.isoformat()},
+        ]
+        response = self.client.post(self.url, {'events': events}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        results = response.data['results']
+        self.assertIn('success', results[0])
+        self.assertEqual(results[1]['error'], "Already in the gym")
+        self.assertIn('success', results[2])
+        self.assertEqual(results[3]['error'], "Member not found")
+
+        session = GymSession.objects.get()
+        self.assertEqual(session.entry_time, entry)
+        self.assertAlmostEqual(session.duration, 45)
+        self.member.refresh_from_db()
+        self.assertFalse(self.member.is_in_gym)
+
+    def test_overdue_session_closed_before_next_entry(self):
+        """Test that an entry long after an unclosed one auto-closes the old session"""
+        first = timezone.now() - timedelta(hours=5)
+        second = first + timedelta(hours=3)
+        events = [
+            {'member_id': self.member.id, 'direction': 'enter', 'timestamp': first.isoformat()},
+            {'member_id': self.member.id, 'direction': 'enter', 'timestamp': second.isoformat()},
+        ]
+        response = self.client.post(self.url, {'events': events}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(GymSession.objects.get().duration, 90)
+        self.member.refresh_from_db()
+        self.assertTrue(self.member.is_in_gym)
+        self.assertEqual(self.member.entry_time, second)
+
+    def test_door_events_admin_only(self):
+        """Test that regular members cannot post door events"""
+        self.client.force_authenticate(user=self.member)
+        response = self.client.post(self.url, {'events': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class SessionPaginationTests(APITestCase):
+    """
+    Test cases for cursor pagination and filters on the session list
+    """
+    def setUp(self):
+        self.admin = Member.objects.create_user(
+            phone_number="9999999999",
+            name="Admin User",
+            password="adminpassword",
+            is_staff=True
+        )
+        self.member = Member.objects.create_user(
+            phone_number="1234567890",
+            name="Test Member",
+            password="testpassword"
+        )
+        now = timezone.now().replace(microsecond=0)
+        # Two sessions share an entry time to exercise the id tie-breaker
+        entry_times = [now - timedelta(days=day) for day in range(5)] + [now - timedelta(days=2)]
+        GymSession.objects.bulk_create([
+            GymSession(
+                member=self.member,
+                entry_time=entry_time,
+                exit_time=entry_time + timedelta(hours=1),
+                duration=60
+            )
+            for entry_time in entry_times
+        ])
+        # An overdue open session is merged into the pages
+        self.admin.is_in_gym = True
+        self.admin.entry_time = now - timedelta(days=1, hours=3)
+        self.admin.save()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_cursor_pages_cover_every_session_once(self):
+        """Test that following next links returns every session once, in order"""
+        url = reverse('session-list') + '?page_size=2'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(len(seen), 7)
+        entry_times = [session['entry_time'] for session in seen]
+        self.assertEqual(entry_times, sorted(entry_times, reverse=True))
+        self.assertEqual(sum(session['id'] is None for session in seen), 1)
+
+    def test_member_and_date_filters(self):
+        """Test the member and date-range filters"""
+        today = timezone.now().date()
+        start = (today - timedelta(days=2)).isoformat()
+        response = self.client.get(reverse('session-list'), {'member': self.member.id, 'start': start})
+        self.assertEqual(len(response.data['results']), 4)
+
+        response = self.client.get(reverse('session-list'), {'end': (today - timedelta(days=3)).isoformat()})
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_invalid_filters(self):
+        """Test that malformed filters and cursors are rejected"""
+        response = self.client.get(reverse('session-list'), {'start': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('session-list'), {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SessionQueryCountTests(APITestCase):
+    """
+    Test cases guarding the session endpoints against N+1 member queries
+    """
+    def setUp(self):
+        self.member = Member.objects.create_user(
+            phone_number="1234567890",
+            name="Test Member",
+            password="testpassword",
+            subscription_start=timezone.now().date(),
+            subscription_end=timezone.now().date() + timedelta(days=30)
+        )
+        self.client.force_authenticate(user=self.member)
+
+    def add_sessions(self, count):
+        now = timezone.now()
+        GymSession.objects.bulk_create([
+            GymSession(
+                member=self.member,
+                entry_time=now - timedelta(days=day + 1),
+                exit_time=now - timedelta(days=day + 1) + timedelta(hours=1),
+                duration=60
+            )
+            for day in range(count)
+        ])
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_constant_queries_regardless_of_rows(self):
+        """Test that member names are fetched in the main query"""
+        for url in (reverse('session-list'), reverse('member-recent-sessions', args=[self.member.id])):
+            GymSession.objects.all().delete()
+            self.add_sessions(2)
+            few = self.count_queries(url)
+            self.add_sessions(20)
+            self.assertEqual(self.count_queries(url), few)
+
+    def test_own_recent_sessions_two_queries(self):
+        """Test that recent sessions take the version lookup and the sessions query"""
+        self.add_sessions(5)
+        url = reverse('member-recent-sessions', args=[self.member.id])
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.data['count'], 5)
+
+    def test_recent_sessions_of_other_members(self):
+        """Test the not-found and forbidden responses for other members"""
+        other = Member.objects.create_user(
+            phone_number="5555555555",
+            name="Other Member",
+            password="testpassword"
+        )
+        response = self.client.get(reverse('member-recent-sessions', args=[other.id]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(reverse('member-recent-sessions', args=[other.id + 100]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class MemberImportTests(APITestCase):
+    """
+    Test cases for the bulk member import endpoint
+    """
+    def setUp(self):
+        self.admin = Member.objects.create_superuser(
+            phone_number="9999999999",
+            name="Admin",
+            password="adminpassword"
+        )
+        self.url = reverse('member-import')
+
+    def upload(self, content):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        csv_file = SimpleUploadedFile("members.csv", content.encode(), content_type="text/csv")
+        return self.client.post(self.url, {"file": csv_file}, format='multipart')
+
+    def test_import_csv(self):
+        """Test that an admin can import members and gets per-row errors"""
+        self.client.force_authenticate(user=self.admin)
+        response = self.upload(
+            "phone_number,name,password\n"
+            "3000000001,Imported Member,secret\n"
+            "9999999999,Admin Again,secret\n"
+            "3000000002,,secret\n"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["skipped"], 1)
+        self.assertEqual(response.data["errors"][0]["row"], 4)
+        self.assertTrue(Member.objects.filter(phone_number="3000000001").exists())
+
+    def test_import_admin_only(self):
+        """Test that members cannot import"""
+        member = Member.objects.create_user(phone_number="1234567890", name="Member", password="testpassword")
+        self.client.force_authenticate(user=member)
+        response = self.upload("phone_number,name,password\n")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class SessionExportTests(APITestCase):
+    """
+    Test cases for the streaming session export endpoint
+    """
+    def setUp(self):
+        self.admin = Member.objects.create_superuser(
+            phone_number="9999999999",
+            name="Admin",
+            password="adminpassword"
+        )
+        self.member = Member.objects.create_user(
+            phone_number="1234567890",
+            name="Test Member",
+            password="testpassword"
+        )
+        now = timezone.now()
+        GymSession.closed(now - timedelta(hours=3), now - timedelta(hours=2), member=self.member).save()
+        GymSession.closed(now - timedelta(days=3), now - timedelta(days=3) + timedelta(hours=1), member=self.member).save()
+        self.url = reverse('session-export')
+
+    def test_streams_csv(self):
+        """Test that sessions are streamed as CSV with filters applied"""
+        self.client.force_authenticate(user=self.admin)
+        start = (timezone.now() - timedelta(days=1)).date().isoformat()
+        response = self.client.get(self.url, {'start': start})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+
+    def test_streams_ndjson(self):
+        """Test the NDJSON output and rejection of unknown formats"""
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(self.url, {'output': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 2)
+
+        response = self.client.get(self.url, {'output': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_admin_only(self):
+        """Test that members cannot export sessions"""
+        self.client.force_authenticate(user=self.member)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class AttendanceStatsTests(APITestCase):
+    """
+    Test cases for the rollup-backed statistics endpoints
+    """
+    def setUp(self):
+        self.admin = Member.objects.create_superuser(
+            phone_number="9999999999",
+            name="Admin",
+            password="adminpassword"
+        )
+        self.member = Member.objects.create_user(
+            phone_number="1234567890",
+            name="Test Member",
+            password="testpassword"
+        )
+        self.day = timezone.localdate() - timedelta(days=1)
+        evening = timezone.make_aware(timezone.datetime.combine(self.day, timezone.datetime.min.time())) + timedelta(hours=18)
+        GymSession.objects.record([
+            GymSession.closed(evening - timedelta(hours=10), evening - timedelta(hours=9, minutes=15), member=self.member),
+            GymSession.closed(evening, evening + timedelta(minutes=30), member=self.member),
+            GymSession.closed(evening, evening + timedelta(minutes=30), member=self.admin),
+        ])
+        self.client.force_authenticate(user=self.admin)
+
+    def test_daily_totals(self):
+        """Test gym-wide and per-member daily statistics"""
+        response = self.client.get(reverse('stats-daily'), {'start': self.day.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        day = response.data['results'][0]
+        self.assertEqual(day['visits'], 3)
+        self.assertEqual(day['average_duration'], 35)
+        self.assertEqual(timezone.localtime(timezone.datetime.fromisoformat(day['peak_hour'])).hour, 18)
+
+        response = self.client.get(reverse('stats-daily'), {'member': self.member.pk})
+        self.assertEqual(response.data['results'][0]['visits'], 2)
+        self.assertEqual(response.data['results'][0]['average_duration'], 37.5)
+
+    def test_hourly_peak(self):
+        """Test hourly rows and the peak hour"""
+        response = self.client.get(reverse('stats-hourly'), {'start': self.day.isoformat(), 'end': self.day.isoformat()})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['peak']['visits'], 2)
+        self.assertEqual(response.data['peak']['average_occupancy'], 1)
+
+    def test_occupancy_curve(self):
+        """Test the occupancy time series of a day"""
+        response = self.client.get(reverse('stats-occupancy'), {'start': self.day.isoformat(), 'end': self.day.isoformat(), 'interval': 30})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['interval'], 30)
+        self.assertEqual(len(response.data['results']), 48)
+        self.assertEqual(response.data['results'][36]['count'], 2)
+        self.assertEqual(response.data['peak']['count'], 2)
+
+        response = self.client.get(reverse('stats-occupancy'), {'interval': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_range(self):
+        """Test that overlong or reversed ranges are rejected"""
+        response = self.client.get(reverse('stats-hourly'), {'start': '2024-01-01', 'end': '2024-03-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('stats-daily'), {'start': '2024-02-01', 'end': '2024-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MemberStatsTests(APITestCase):
+    """
+    Test cases for the member attendance summary endpoint
+    """
+    def setUp(self):
+        self.member = Member.objects.create_user(
+            phone_number="1234567890",
+            name="Test Member",
+            password="testpassword",
+            subscription_start=timezone.now().date(),
+            subscription_end=timezone.now().date() + timedelta(days=30)
+        )
+        self.other = Member.objects.create_user(
+            phone_number="0987654321",
+            name="Other Member",
+            password="testpassword"
+        )
+        self.url = reverse('member-stats', kwargs={'pk': self.member.pk})
+
+    def visit(self, days_ago, minutes):
+        entry = timezone.now() - timedelta(days=days_ago)
+        Member.objects.filter(pk=self.member.pk).update(is_in_gym=True, entry_time=entry)
+        Member.objects.exit(self.member.pk, now=entry + timedelta(minutes=minutes))
+
+    def test_stats_follow_exits(self):
+        """Test that exits update the totals and the streak"""
+        self.client.force_authenticate(user=self.member)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['total_visits'], 0)
+        self.assertEqual(response.data['current_streak'], 0)
+
+        self.visit(5, 30)
+        self.visit(1, 60)
+        self.visit(0, 30)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['total_visits'], 3)
+        self.assertEqual(response.data['total_minutes'], 120)
+        self.assertEqual(response.data['current_streak'], 2)
+        self.assertEqual(response.data['longest_streak'], 2)
+
+    def test_rebuild_matches_incremental_stats(self):
+        """Test that rebuild_rollups backfills the same counters"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        for days_ago in (3, 2, 0):
+            self.visit(days_ago, 45)
+        expected = MemberStats.objects.filter(pk=self.member.pk).values().get()
+        MemberStats.objects.all().delete()
+
+        call_command('rebuild_rollups', chunk_size=1, stdout=StringIO())
+        self.assertEqual(MemberStats.objects.filter(pk=self.member.pk).values().get(), expected)
+
+    def test_only_own_stats(self):
+        """Test that members cannot read other members' stats"""
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ConditionalGetTests(APITestCase):
+    """
+    Test cases for ETag / If-None-Match support on the polled read endpoints
+    """
+    def setUp(self):
+        self.member = Member.objects.create_user(
+            phone_number="1234567890",
+            name="Test Member",
+            password="testpassword",
+            subscription_start=timezone.now().date(),
+            subscription_end=timezone.now().date() + timedelta(days=30)
+        )
+        self.client.force_authenticate(user=self.member)
+        in_gym_cache.clear()
+        self.urls = [
+            reverse('member-detail', args=[self.member.id]),
+            reverse('members-in-gym'),
+            reverse('member-recent-sessions', args=[self.member.id]),
+        ]
+
+    def etags(self):
+        etags = []
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etags.append(response['ETag'])
+        return etags
+
+    def test_unchanged_resources_not_modified(self):
+        """Test that a matching If-None-Match gets 304 without the main queries"""
+        for url, etag in zip(self.urls, self.etags()):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response['ETag'], etag)
+            self.assertLessEqual(len(queries), 2)
+            self.assertFalse(any('"gym_gymsession"' in query['sql'] for query in queries.captured_queries))
+
+    def test_writes_change_etags(self):
+        """Test that enter, exit and updates invalidate every versioned endpoint"""
+        before = self.etags()
+        self.member.enter_gym()
+        after_enter = self.etags()
+        self.assertTrue(all(old != new for old, new in zip(before, after_enter)))
+
+        self.member.exit_gym()
+        after_exit = self.etags()
+        self.assertTrue(all(old != new for old, new in zip(after_enter, after_exit)))
+
+        self.member.enter_gym()
+        in_gym = self.etags()
+        member = Member.objects.get(pk=self.member.pk)
+        revision = member.revision
+        member.name = "Renamed Member"
+        member.save()
+        self.assertEqual(member.revision, revision + 1)
+        self.assertTrue(all(old != new for old, new in zip(in_gym, self.etags())))
+
+    def test_overdue_session_changes_etag(self):
+        """Test that a session becoming overdue changes the ETag without any write"""
+        self.member.enter_gym()
+        before = self.etags()
+        # Move the entry back without bumping the revision, as the passing of time would
+        Member.objects.filter(pk=self.member.pk).update(entry_time=timezone.now() - timedelta(hours=2))
+        self.assertTrue(all(old != new for old, new in zip(before, self.etags())))
+
+
+class AsyncViewTests(TestCase):
+    """
+    Test cases for the async-native enter, exit, in-gym and recent sessions views
+    """
+    def setUp(self):
+        self.member = Member.objects.create_user(
+            phone_number="1234567890",
+            name="Test Member",
+            password="testpassword",
+            subscription_start=timezone.now().date(),
+            subscription_end=timezone.now().date() + timedelta(days=30)
+        )
+        self.other = Member.objects.create_user(
+            phone_number="0987654321",
+            name="Other Member",
+            password="testpassword",
+            subscription_start=timezone.now().date(),
+            subscription_end=timezone.now().date() + timedelta(days=30)
+        )
+        self.token = str(MemberRefreshToken.for_user(self.member).access_token)
+        self.factory = AsyncRequestFactory()
+        in_gym_cache.clear()
+
+    def request(self, method, headers=None, token=None):
+        headers = {"authorization": f"Bearer {token or self.token}", **(headers or {})}
+        return getattr(self.factory, method)("/", headers=headers)
+
+    async def test_enter_and_exit(self):
+        """Test that members can enter and exit, and get the sync views' errors"""
+        response = await async_views.member_enter(self.request("post"), pk=self.member.pk)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content), {"success": "Successfully entered the gym"})
+        response = await async_views.member_enter(self.request("post"), pk=self.member.pk)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = await async_views.member_exit(self.request("post"), pk=self.member.pk)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(await GymSession.objects.filter(member=self.member).acount(), 1)
+
+        response = await async_views.member_enter(self.request("post"), pk=self.other.pk)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = await async_views.member_enter(self.request("post"), pk=9999)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = await async_views.member_enter(self.request("get"), pk=self.member.pk)
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_authentication_and_subscription_required(self):
+        """Test that missing tokens are rejected and expired subscriptions forbidden"""
+        response = await async_views.in_gym_members(self.factory.get("/"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", response)
+        response = await async_views.in_gym_members(self.request("get", token="invalid"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        await Member.objects.filter(pk=self.member.pk).aupdate(
+            subscription_end=timezone.now().date() - timedelta(days=1)
+        )
+        await self.member.arefresh_from_db()
+        token = str(MemberRefreshToken.for_user(self.member).access_token)
+        response = await async_views.in_gym_members(self.request("get", token=token))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_in_gym_members_conditional_get(self):
+        """Test that the async in-gym list matches the sync payload and honours ETags"""
+        await Member.objects.aenter(self.member.pk)
+        response = await async_views.in_gym_members(self.request("get"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = json.loads(response.content)
+        self.assertEqual(data["count"], 1)
+        self.assertEqual(data["members"][0]["name"], "Test Member")
+
+        response = await async_views.in_gym_members(
+            self.request("get", headers={"if-none-match": response["ETag"]})
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_recent_sessions(self):
+        """Test that recent sessions include an overdue session and stay private"""
+        await Member.objects.filter(pk=self.member.pk).aupdate(
+            is_in_gym=True, entry_time=timezone.now() - timedelta(hours=2)
+        )
+        response = await async_views.member_recent_sessions(self.request("get"), id=self.member.pk)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = json.loads(response.content)
+        self.assertEqual(data["count"], 1)
+        self.assertEqual(data["sessions"][0]["member_name"], "Test Member")
+
+        response = await async_views.member_recent_sessions(self.request("get"), id=self.other.pk)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = await async_views.member_recent_sessions(self.request("get"), id=9999)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_login(self):
+        """Test that the async login issues tokens and upgrades legacy password hashes"""
+        from django.contrib.auth.hashers import identify_hasher, make_password
+
+        await Member.objects.filter(pk=self.member.pk).aupdate(
+            password=make_password("testpassword", hasher="pbkdf2_sha256")
+        )
+        data = {"phone_number": "1234567890", "password": "testpassword"}
+        response = await async_views.login(
+            self.factory.post("/", data, content_type="application/json")
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = json.loads(response.content)
+        self.assertIn("access", body)
+        self.assertEqual(body["user"]["phone_number"], "1234567890")
+
+        await self.member.arefresh_from_db()
+        self.assertNotEqual(identify_hasher(self.member.password).algorithm, "pbkdf2_sha256")
+
+        data["password"] = "wrongpassword"
+        response = await async_views.login(
+            self.factory.post("/", data, content_type="application/json")
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(json.loads(response.content), {"error": ["Incorrect password"]})
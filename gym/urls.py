@@ -1,23 +1,56 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
-from . import views
+from . import async_views, views
+
+# The hot endpoints have async-native versions for deployments served under ASGI
+if getattr(settings, 'GYM_ASYNC_VIEWS', False):
+    login = async_views.login
+    member_enter = async_views.member_enter
+    member_exit = async_views.member_exit
+    in_gym_members = async_views.in_gym_members
+    member_recent_sessions = async_views.member_recent_sessions
+else:
+    login = views.LoginView.as_view()
+    member_enter = views.MemberEnterGymView.as_view()
+    member_exit = views.MemberExitGymView.as_view()
+    in_gym_members = views.InGymMembersView.as_view()
+    member_recent_sessions = views.MemberRecentSessionsView.as_view()
 
 urlpatterns = [
     # Authentication endpoints
     path('register/', views.RegisterView.as_view(), name='register'),
-    path('login/', views.LoginView.as_view(), name='login'),
+    path('login/', login, name='login'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     
     # Member endpoints
     path('members/', views.MemberListView.as_view(), name='member-list'),
     path('members/<int:pk>/', views.MemberDetailView.as_view(), name='member-detail'),
-    path('members/in-gym/', views.InGymMembersView.as_view(), name='members-in-gym'),
+    path('members/in-gym/', in_gym_members, name='members-in-gym'),
+    path('members/in-gym/count/', views.InGymCountView.as_view(), name='members-in-gym-count'),
+    path('members/import/', views.MemberImportView.as_view(), name='member-import'),
+    path('members/<int:pk>/stats/', views.MemberStatsView.as_view(), name='member-stats'),
     
     # Gym session tracking endpoints
-    path('members/<int:pk>/enter/', views.MemberEnterGymView.as_view(), name='member-enter'),
-    path('members/<int:pk>/exit/', views.MemberExitGymView.as_view(), name='member-exit'),
+    path('members/<int:pk>/enter/', member_enter, name='member-enter'),
+    path('members/<int:pk>/exit/', member_exit, name='member-exit'),
     path('sessions/', views.GymSessionListView.as_view(), name='session-list'),
+    path('sessions/export/', views.SessionExportView.as_view(), name='session-export'),
+    path('door-events/', views.DoorEventBatchView.as_view(), name='door-events'),
+    
+    # Attendance statistics, served from the rollup tables
+    path('stats/daily/', views.DailyStatsView.as_view(), name='stats-daily'),
+    path('stats/hourly/', views.HourlyStatsView.as_view(), name='stats-hourly'),
+    path('stats/occupancy/', views.OccupancyCurveView.as_view(), name='stats-occupancy'),
+    path('stats/cache/', views.CacheStatsView.as_view(), name='stats-cache'),
     
     # New endpoint for recent sessions by member ID
-    path('sessions/<int:id>/', views.MemberRecentSessionsView.as_view(), name='member-recent-sessions'),
+    path('sessions/<int:id>/', member_recent_sessions, name='member-recent-sessions'),
 ]
+
+if getattr(settings, 'GYM_ASYNC_VIEWS', False):
+    # Streams are only served under ASGI, where they do not hold a worker
+    urlpatterns += [
+        path('members/in-gym/stream/', async_views.occupancy_stream, name='members-in-gym-stream'),
+        path('members/in-gym/stream/token/', views.StreamTokenView.as_view(), name='members-in-gym-stream-token'),
+    ]
@@ -1,12 +1,33 @@
+import codecs
+import csv
+from datetime import datetime, time, timedelta, timezone as dt_timezone
 from django.db import models
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from rest_framework import generics, permissions, status
+from rest_framework.parsers import MultiPartParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .models import Member, GymSession
-from .serializers import MemberSerializer, MemberUpdateSerializer, LoginSerializer, GymSessionSerializer
+from .models import (
+    Member, GymSession, GymOccupancy, DailyMemberStats, HourlyOccupancy, MemberStats, SESSION_TIME_LIMIT
+)
+from .serializers import (
+    MemberSerializer, MemberUpdateSerializer, LoginSerializer, GymSessionSerializer,
+    DoorEventBatchSerializer, DailyMemberStatsSerializer, DailyTotalsSerializer,
+    HourlyOccupancySerializer, MemberStatsSerializer
+)
 from .permissions import HasActiveSubscription
-from datetime import timedelta
+from .authentication import StatelessJWTAuthentication, StreamToken
+from .filters import (
+    session_filters, filter_by_entry_time, stats_date_range, day_range_bounds, interval_minutes
+)
+from .pagination import SessionCursorPagination
+from .sweeper import sweep_if_stale
+from .importer import import_members
+from .exporter import CONTENT_TYPES, EXPORT_FORMATS, export_lines
+from .analytics import occupancy_curve
+from .conditional import ConditionalGetMixin, member_version, member_etag, in_gym_etag
+from .cache import member_cache, in_gym_cache
 
 class RegisterView(APIView):
     """
@@ -23,6 +44,9 @@ class LoginView(APIView):
     API endpoint for member login
     Returns user details and JWT tokens
     """
+    # Credentials are in the body, so skip token parsing and permission checks
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
         if not serializer.is_valid():
@@ -31,23 +55,7 @@ class LoginView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        validated_data = serializer.validated_data
-        member = validated_data["member"]
-        return Response(
-            {
-                "user": {
-                    "id": member.id,
-                    "name": member.name,
-                    "phone_number": member.phone_number,
-                    "subscription_start": member.subscription_start,
-                    "subscription_end": member.subscription_end,
-                    "has_active_subscription": member.has_active_subscription,
-                },
-                "refresh": validated_data["refresh"],
-                "access": validated_data["access"],
-            },
-            status=status.HTTP_200_OK,
-        )
+        return Response(login_payload(serializer.validated_data), status=status.HTTP_200_OK)
 class MemberListView(generics.ListAPIView):
     """
     API endpoint to list all members
@@ -56,23 +64,19 @@ class MemberListView(generics.ListAPIView):
     queryset = Member.objects.all()
     serializer_class = MemberSerializer
     permission_classes = [permissions.IsAdminUser]
-    
-    def list(self, request, *args, **kwargs):
-        # Check and close long sessions before processing
-        closed_count = check_and_close_long_sessions()
-        if closed_count > 0:
-            print(f"Auto-closed {closed_count} sessions that exceeded 1.5 hours")
-            
-        return super().list(request, *args, **kwargs)
         
-class MemberDetailView(generics.RetrieveUpdateAPIView):
+class MemberDetailView(ConditionalGetMixin, generics.RetrieveUpdateAPIView):
     """
     API endpoint to retrieve and update member details
-    GET: Accessible by the member themselves or admin
+    GET: Accessible by the member themselves or admin, supports If-None-Match
     PUT/PATCH: Only accessible by admin
     """
     queryset = Member.objects.all()
     
+    def get_etag(self, request, pk):
+        member = member_version(pk)
+        return member_etag("member", member) if member else None
+    
     def get_serializer_class(self):
         if self.request.method == "GET":
             return MemberSerializer
@@ -81,11 +85,31 @@ class MemberDetailView(generics.RetrieveUpdateAPIView):
         if self.request.method in ["PUT", "PATCH"]:
             return [permissions.IsAdminUser()]
         return [permissions.IsAuthenticated(), HasActiveSubscription()]
+
+class MemberImportView(APIView):
+    """
+    API endpoint to bulk import members from an uploaded CSV file
+    Existing phone numbers are skipped, or updated with ?update_existing=true
+    Only accessible by admin users
+    """
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"error": "Upload a CSV file in the 'file' field"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-    def retrieve(self, request, *args, **kwargs):
-        # Check and close long sessions before processing
-        check_and_close_long_sessions()
-        return super().retrieve(request, *args, **kwargs)
+        # Decode line by line so the file is never read into memory at once
+        rows = csv.DictReader(codecs.iterdecode(upload, "utf-8-sig"))
+        update_existing = request.query_params.get("update_existing", "").lower() in ("1", "true", "yes")
+        try:
+            result = import_members(rows, update_existing=update_existing)
+        except (UnicodeDecodeError, csv.Error) as exc:
+            return Response({"error": f"Invalid CSV file: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
         
 class MemberEnterGymView(APIView):
     """
@@ -96,22 +120,19 @@ class MemberEnterGymView(APIView):
         # Check and close long sessions before processing
         check_and_close_long_sessions()
         
-        try:
-            member = Member.objects.get(pk=pk)
-        except Member.DoesNotExist:
-            return Response(
-                {"error": "Member not found"},
-                status=status.HTTP_404_NOT_FOUND
-            )
         # Check if user is trying to update their own record or is admin
         if request.user.pk != pk and not request.user.is_staff:
+            if not Member.objects.filter(pk=pk).exists():
+                return member_not_found_response()
             return Response(
                 {"error": "You can only update your own gym status"},
                 status=status.HTTP_403_FORBIDDEN
             )
-        success, message = member.enter_gym()
+        success, message = Member.objects.enter(pk)
         
         if not success:
+            if not Member.objects.filter(pk=pk).exists():
+                return member_not_found_response()
             return Response(
                 {"error": message},
                 status=status.HTTP_400_BAD_REQUEST
@@ -127,142 +148,339 @@ class MemberExitGymView(APIView):
         # Check and close long sessions before processing
         check_and_close_long_sessions()
         
-        try:
-            member = Member.objects.get(pk=pk)
-        except Member.DoesNotExist:
-            return Response(
-                {"error": "Member not found"},
-                status=status.HTTP_404_NOT_FOUND
-            )
         # Check if user is trying to update their own record or is admin
         if request.user.pk != pk and not request.user.is_staff:
+            if not Member.objects.filter(pk=pk).exists():
+                return member_not_found_response()
             return Response(
                 {"error": "You can only update your own gym status"},
                 status=status.HTTP_403_FORBIDDEN
             )
-        success, message = member.exit_gym()
+        success, message = Member.objects.exit(pk)
         
         if not success:
+            if not Member.objects.filter(pk=pk).exists():
+                return member_not_found_response()
             return Response(
                 {"error": message},
                 status=status.HTTP_400_BAD_REQUEST
             )
             
         return Response({"success": message})
+class DoorEventBatchView(APIView):
+    """
+    API endpoint for turnstile controllers to replay buffered scans
+    Applies an ordered list of enter/exit events in one transaction
+    Only accessible by admin users
+    """
+    permission_classes = [permissions.IsAdminUser]
+    def post(self, request):
+        serializer = DoorEventBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        events = serializer.validated_data["events"]
+        results = Member.objects.apply_door_events(events)
+        return Response({
+            "results": [
+                {
+                    "member_id": event["member_id"],
+                    "direction": event["direction"],
+                    "success" if success else "error": message,
+                }
+                for event, (success, message) in zip(events, results)
+            ]
+        })
 class GymSessionListView(generics.ListAPIView):
     """
     API endpoint to list gym sessions
     Admin: Can view all sessions
     Members: Can only view their own sessions
+    Cursor paginated, filterable by ?member=<id>&start=<date>&end=<date>
     """
     serializer_class = GymSessionSerializer
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated, HasActiveSubscription]
+    pagination_class = SessionCursorPagination
     
     def get_queryset(self):
-        # Check and close long sessions before processing
-        check_and_close_long_sessions()
-        
         user = self.request.user
-        if user.is_staff:
-            return GymSession.objects.all()
-        return GymSession.objects.filter(member=user)
-class InGymMembersView(generics.ListAPIView):
+        sessions = GymSession.objects.with_member_name()
+        if not user.is_staff:
+            sessions = sessions.filter(member_id=user.pk)
+        return filter_by_entry_time(sessions, "member_id", *session_filters(self.request.query_params))
+
+    def list(self, request, *args, **kwargs):
+        # Overdue sessions are listed as closed even before the sweeper writes them
+        user = request.user
+        members = Member.objects.all() if user.is_staff else Member.objects.filter(pk=user.pk)
+        members = filter_by_entry_time(members, "pk", *session_filters(request.query_params))
+        
+        page = self.paginator.paginate_queryset(
+            self.get_queryset(), request, view=self, pending=members.pending_sessions()
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+class SessionExportView(APIView):
+    """
+    API endpoint to download gym sessions as a streamed file
+    Choose ?output=csv (default) or ?output=ndjson,
+    filterable by ?member=<id>&start=<date>&end=<date>
+    Only accessible by admin users
+    """
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+    def get(self, request):
+        # ?format= is reserved by DRF for content negotiation
+        export_format = request.query_params.get("output", "csv")
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"output": f"Choose one of: {', '.join(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        sessions = filter_by_entry_time(GymSession.objects.all(), "member_id", *session_filters(request.query_params))
+        response = StreamingHttpResponse(
+            export_lines(export_format, sessions), content_type=CONTENT_TYPES[export_format]
+        )
+        response["Content-Disposition"] = f'attachment; filename="sessions.{export_format}"'
+        return response
+class DailyStatsView(APIView):
+    """
+    API endpoint for daily attendance, read from the rollup tables
+    Gym-wide totals per day, or one member's days with ?member=<id>
+    Filterable by ?start=<date>&end=<date> (default: the last 30 days)
+    Only accessible by admin users
+    """
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+    def get(self, request):
+        first_day, last_day = stats_date_range(request.query_params)
+        member_id, _, _ = session_filters(request.query_params)
+        
+        if member_id is not None:
+            days = DailyMemberStats.objects.filter(
+                member_id=member_id, date__gte=first_day, date__lte=last_day
+            ).order_by("date")
+            return Response({"results": DailyMemberStatsSerializer(days, many=True).data})
+        
+        days = HourlyOccupancy.objects.daily_totals(first_day, last_day)
+        return Response({"results": DailyTotalsSerializer(days, many=True).data})
+class HourlyStatsView(APIView):
+    """
+    API endpoint for hourly attendance and the peak hour, read from the rollup tables
+    Filterable by ?start=<date>&end=<date> (default: today, at most 31 days)
+    Only accessible by admin users
+    """
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+    def get(self, request):
+        first_day, last_day = stats_date_range(request.query_params, default_days=1, max_days=31)
+        hours = list(HourlyOccupancy.objects.between_days(first_day, last_day))
+        peak = max(hours, key=lambda row: row.occupied_minutes, default=None)
+        return Response({
+            "peak": HourlyOccupancySerializer(peak).data if peak else None,
+            "results": HourlyOccupancySerializer(hours, many=True).data,
+        })
+class OccupancyCurveView(APIView):
+    """
+    API endpoint for the number of members in the gym at every interval
+    Computed from sessions and open entries in a single sweep, with the peak
+    and the time-weighted mean occupancy
+    Filterable by ?start=<date>&end=<date>&interval=<minutes>
+    (default: today in 15 minute intervals, at most 31 days)
+    Only accessible by admin users
+    """
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+    def get(self, request):
+        first_day, last_day = stats_date_range(request.query_params, default_days=1, max_days=31)
+        minutes = interval_minutes(request.query_params)
+        start, end = day_range_bounds(first_day, last_day)
+        
+        curve = occupancy_curve(start, end, interval=timedelta(minutes=minutes))
+        return Response({"interval": minutes, **curve})
+class InGymMembersView(ConditionalGetMixin, generics.ListAPIView):
     """
     API endpoint to list all members currently in the gym
     Accessible by any authenticated member with active subscription
+    Supports If-None-Match, versioned by the occupancy revision
     """
     serializer_class = MemberSerializer
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated, HasActiveSubscription]
     
+    def get_etag(self, request):
+        return in_gym_etag()
+    
     def get_queryset(self):
-        # Check and close long sessions before processing
-        check_and_close_long_sessions()
-        
         """Return only members who are currently in the gym"""
-        return Member.objects.filter(is_in_gym=True)
+        return Member.objects.in_gym()
     
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        # The list is the same for every caller, so it is served from a shared cache
+        members = in_gym_cache.get(self.build_members)
         
         # Add count of members in gym to response
         return Response({
-            "count": queryset.count(),
-            "members": serializer.data
+            "count": len(members),
+            "members": members
         })
 
-class MemberRecentSessionsView(generics.ListAPIView):
+    def build_members(self):
+        """Serialize the list, and work out when it goes stale without any write"""
+        now = timezone.now()
+        members = list(self.get_queryset())
+        data = [dict(member) for member in self.get_serializer(members, many=True).data]
+        
+        return data, in_gym_expires_at(members, now)
+
+class InGymCountView(APIView):
+    """
+    API endpoint returning how many members are in the gym
+    Reads the maintained occupancy counter instead of scanning members
+    """
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated, HasActiveSubscription]
+    def get(self, request):
+        return Response({"count": GymOccupancy.objects.current()})
+
+class StreamTokenView(APIView):
+    """
+    API endpoint issuing a one-minute token for opening the occupancy stream
+    with ?token=, for EventSource clients that cannot send the access token
+    Accessible by any authenticated member with active subscription
+    """
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated, HasActiveSubscription]
+    def post(self, request):
+        member = Member.objects.get(pk=request.user.pk)
+        return Response({"token": str(StreamToken.for_user(member))})
+
+class MemberRecentSessionsView(ConditionalGetMixin, generics.ListAPIView):
     """
     API endpoint to retrieve recent sessions for a specific member by ID
     Limited to 50 most recent sessions
     Admin: Can view any member's sessions
     Members: Can only view their own sessions
+    Supports If-None-Match, versioned by the member's revision
     """
     serializer_class = GymSessionSerializer
     permission_classes = [permissions.IsAuthenticated, HasActiveSubscription]
+    member = None
+    
+    def get_etag(self, request, id):
+        # Recording a session always writes the member row, bumping its revision
+        self.member = member_version(id)
+        if self.member is None or (request.user.pk != id and not request.user.is_staff):
+            return None
+        return member_etag("sessions", self.member)
     
     def get_queryset(self):
-        # Check and close long sessions before processing
-        check_and_close_long_sessions()
-        
+        """Return up to 50 most recent sessions for the member"""
         member_id = self.kwargs.get('id')
-        
-        # Check if member exists
-        try:
-            member = Member.objects.get(pk=member_id)
-        except Member.DoesNotExist:
-            return GymSession.objects.none()
-        
-        # Check permissions - only allow staff or the member themselves
-        user = self.request.user
-        if not user.is_staff and user.pk != member.pk:
-            return GymSession.objects.none()
-            
-        # Return up to 50 most recent sessions for the member
-        return GymSession.objects.filter(member=member).order_by('-entry_time')[:50]
+        return GymSession.objects.with_member_name().filter(member_id=member_id).order_by('-entry_time')[:50]
     
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
+        member_id = self.kwargs.get('id')
+        user = request.user
+        
+        # The member was loaded by get_etag
+        member = self.member
+        if member is None:
+            return member_not_found_response()
+        if user.pk != member_id and not user.is_staff:
+            return Response(
+                {"error": "You can only view your own sessions"},
+                status=status.HTTP_403_FORBIDDEN
+            )
         
-        # If queryset is empty due to permissions or non-existent member
-        if not queryset.exists() and 'id' in self.kwargs:
-            try:
-                Member.objects.get(pk=self.kwargs.get('id'))
-                # Member exists but user doesn't have permission
-                if request.user.pk != self.kwargs.get('id') and not request.user.is_staff:
-                    return Response(
-                        {"error": "You can only view your own sessions"},
-                        status=status.HTTP_403_FORBIDDEN
-                    )
-            except Member.DoesNotExist:
-                # Member doesn't exist
-                return Response(
-                    {"error": "Member not found"},
-                    status=status.HTTP_404_NOT_FOUND
-                )
+        sessions = list(self.get_queryset())
+        # An overdue open session is always the member's most recent one
+        if member.is_session_overdue:
+            sessions = [GymSession.auto_closed(member.entry_time, member=member), *sessions][:50]
         
-        serializer = self.get_serializer(queryset, many=True)
+        serializer = self.get_serializer(sessions, many=True)
         return Response({
-            "count": queryset.count(),
+            "count": len(sessions),
             "sessions": serializer.data
         })
 
+class MemberStatsView(APIView):
+    """
+    API endpoint for a member's attendance summary: total visits and minutes,
+    current streak and this month's average session length
+    Read from the member's MemberStats row, which sessions update as they are recorded
+    Admin: Can view any member's stats
+    Members: Can only view their own stats
+    """
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated, HasActiveSubscription]
+    def get(self, request, pk):
+        user = request.user
+        if user.pk != pk and not user.is_staff:
+            if not Member.objects.filter(pk=pk).exists():
+                return member_not_found_response()
+            return Response(
+                {"error": "You can only view your own stats"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        stats = MemberStats.objects.filter(member_id=pk).first()
+        if stats is None:
+            # Members without recorded sessions have no stats row yet
+            if user.pk != pk and not Member.objects.filter(pk=pk).exists():
+                return member_not_found_response()
+            stats = MemberStats(member_id=pk)
+        return Response(MemberStatsSerializer(stats).data)
+
+class CacheStatsView(APIView):
+    """
+    API endpoint reporting hit ratios and rebuild latency of this worker's caches
+    Only accessible by admin users
+    """
+    permission_classes = [permissions.IsAdminUser]
+    def get(self, request):
+        return Response({
+            "member_cache": member_cache.stats(),
+            "in_gym_cache": in_gym_cache.stats(),
+        })
+
+def login_payload(validated_data):
+    """Response body of a successful login"""
+    member = validated_data["member"]
+    return {
+        "user": {
+            "id": member.id,
+            "name": member.name,
+            "phone_number": member.phone_number,
+            "subscription_start": member.subscription_start,
+            "subscription_end": member.subscription_end,
+            "has_active_subscription": member.has_active_subscription,
+        },
+        "refresh": validated_data["refresh"],
+        "access": validated_data["access"],
+    }
+
+def member_not_found_response():
+    """Response returned when the requested member does not exist"""
+    return Response(
+        {"error": "Member not found"},
+        status=status.HTTP_404_NOT_FOUND
+    )
+
+def in_gym_expires_at(members, now):
+    """Return when a list of the given in-gym members goes stale without any write"""
+    # has_active_subscription changes at midnight, is_in_gym when a session becomes overdue
+    expires_at = datetime.combine(now.date() + timedelta(days=1), time.min, tzinfo=dt_timezone.utc)
+    entry_times = [member.entry_time for member in members if member.entry_time]
+    if entry_times:
+        expires_at = min(expires_at, min(entry_times) + SESSION_TIME_LIMIT)
+    return expires_at
+
 def check_and_close_long_sessions():
     """
     Utility function to close sessions that have been open for more than 1.5 hours
-    This is called when accessing session-related endpoints
+    Only sweeps when the last sweep is older than settings.GYM_SWEEP_MAX_AGE
     """
-    # Calculate the cutoff time (1 hour and 30 minutes ago)
-    cutoff_time = timezone.now() - timedelta(hours=1, minutes=30)
-    
-    # Find members who are in the gym with entry time older than the cutoff
-    long_sessions = Member.objects.filter(
-        is_in_gym=True,
-        entry_time__lt=cutoff_time
-    )
-    
-    # Close each session
-    for member in long_sessions:
-        member.exit_gym()
-    
-    return len(long_sessions)
+    return sweep_if_stale()
@@ -95,6 +95,34 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# The first hasher hashes new passwords. Passwords stored with any other listed
+# hasher, or with older parameters, are rehashed on the member's next login.
+# Argon2 (pip install argon2-cffi) is preferred; scrypt is used without it.
+try:
+    import argon2  # noqa: F401
+    PREFERRED_PASSWORD_HASHER = 'gym.hashers.TunedArgon2PasswordHasher'
+except ImportError:
+    PREFERRED_PASSWORD_HASHER = 'gym.hashers.TunedScryptPasswordHasher'
+
+PASSWORD_HASHERS = list(dict.fromkeys([
+    PREFERRED_PASSWORD_HASHER,
+    'gym.hashers.TunedScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]))
+
+# Hasher cost parameters, see gym.hashers.DEFAULT_HASHER_PARAMS for the keys
+GYM_PASSWORD_HASHER_PARAMS = {}
+
+# Maximum number of passwords hashed concurrently during login
+# (defaults to the number of CPU cores)
+GYM_LOGIN_HASH_WORKERS = None
+
+# Number of processes hashing passwords during bulk member imports
+# (defaults to the number of CPU cores)
+GYM_IMPORT_WORKERS = None
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -120,7 +148,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'gym.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -153,6 +181,8 @@ SIMPLE_JWT = {
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
     'TOKEN_USER_CLASS': 'rest_framework_simplejwt.models.TokenUser',
+    # Refreshed access tokens carry the member's current claims
+    'TOKEN_REFRESH_SERIALIZER': 'gym.serializers.MemberTokenRefreshSerializer',
     
     'JTI_CLAIM': 'jti',
     
@@ -163,3 +193,53 @@ SIMPLE_JWT = {
 
 # Add this to your settings.py
 AUTH_USER_MODEL = 'gym.Member'
+
+# Read-only endpoints authorize members from access token claims instead of
+# loading the Member row. The current token version of each member is cached
+# for GYM_TOKEN_VERSION_TTL seconds, so a revocation reaches other workers
+# within that time (immediately when they share a cache).
+GYM_STATELESS_AUTH = True
+GYM_TOKEN_VERSION_TTL = 300
+
+# Per-process LRU cache of authenticated members. Entries are dropped when a
+# member is saved or changes gym status in the same process; TTL (seconds)
+# bounds staleness after writes made by other worker processes.
+GYM_MEMBER_CACHE = {
+    'ENABLED': True,
+    'MAX_SIZE': 1024,
+    'TTL': 30,
+}
+
+# Shared cache of the serialized in-gym member list, stored in the CACHES entry
+# named by ALIAS. Enter, exit, auto-close and reset invalidate it. With several
+# worker processes, point ALIAS at a shared backend (file, database or Redis).
+# TIMEOUT (seconds) is an upper bound on how long a list is kept.
+GYM_IN_GYM_CACHE = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 60,
+}
+
+# Route enter, exit, the in-gym list and recent sessions to the async views in
+# gym/async_views.py, and serve the members/in-gym/stream/ event stream.
+# Enable when serving through asgi.py; under WSGI every async view would run
+# on its own event loop, and a stream would never send anything.
+GYM_ASYNC_VIEWS = False
+
+# Broker behind the members/in-gym/stream/ Server-Sent Events endpoint.
+# "memory" fans events out within one process; "cache" passes them through the
+# CACHES entry named by ALIAS so several worker processes can share them
+# (subscribers poll it every POLL_INTERVAL seconds). HEARTBEAT is the number
+# of idle seconds before a keep-alive comment is sent.
+GYM_EVENTS = {
+    'BACKEND': 'memory',
+    'ALIAS': 'default',
+    'QUEUE_SIZE': 100,
+    'HEARTBEAT': 15,
+    'POLL_INTERVAL': 1,
+}
+
+# Request handlers close overdue sessions only when the last sweep is older
+# than this many seconds. Set to None when `manage.py close_long_sessions --loop`
+# runs alongside the app with a cache shared by all workers.
+GYM_SWEEP_MAX_AGE = 60